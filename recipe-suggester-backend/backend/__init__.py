@@ -0,0 +1,5 @@
+try:
+    from .celery import app as celery_app
+except ImportError:
+    # Celery is optional; background work falls back to in-process threads
+    celery_app = None
@@ -14,3 +14,9 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_asgi_application()
+
+# Build in-memory ingredient indexes before serving the first request; failures are
+# only logged, so the application still imports while the database is down
+from recipes.autocomplete import warm_up  # noqa: E402
+
+warm_up()
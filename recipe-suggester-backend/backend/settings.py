@@ -15,6 +15,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',  # Added for token-based authentication
     'corsheaders',
@@ -53,12 +54,32 @@ TEMPLATES = [
         },
     },
 ]
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
+# Rendered responses and leaderboards, shared by every worker process when REDIS_URL or
+# MEMCACHED_LOCATION is set. Without either each process gets its own LocMem cache, which
+# is only right for development. Nothing here needs atomic updates: the version stamps
+# that invalidate it live in the database (recipes.versions).
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+elif os.environ.get('MEMCACHED_LOCATION'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': os.environ['MEMCACHED_LOCATION'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'recipe-suggester',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
     }
-}
 
 WSGI_APPLICATION = 'backend.wsgi.application'
 
@@ -149,4 +170,29 @@ DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
 # Site url
 # TODO
-SITE_URL = "recipesuggester.com"
\ No newline at end of file
+SITE_URL = "recipesuggester.com"
+
+# Random recipe carousel: seconds each random sample is kept, and whether
+# every user gets their own rotation instead of a shared one
+RANDOM_RECIPES_WINDOW = 300
+RANDOM_RECIPES_PER_USER = False
+
+# Background jobs such as recipe indexing (see recipes/background.py). With no broker
+# configured they run on a local thread pool; EAGER runs them inside the request.
+CELERY_BROKER_URL = os.environ.get("CELERY_BROKER_URL")
+BACKGROUND_TASKS_EAGER = False
+BACKGROUND_TASKS_WORKERS = 2
+
+# Periodic management commands, run by `celery -A backend beat` alongside the workers
+CELERY_BEAT_SCHEDULE = {
+    'refresh-trending-recipes': {
+        'task': 'recipes.tasks.run_command',
+        'schedule': 10 * 60,
+        'args': ['refresh_trending_recipes'],
+    },
+    'index-pending-recipes': {
+        'task': 'recipes.tasks.run_command',
+        'schedule': 10 * 60,
+        'args': ['index_pending_recipes'],
+    },
+}
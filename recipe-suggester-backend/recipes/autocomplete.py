@@ -0,0 +1,86 @@
+import logging
+from bisect import bisect_left
+
+from django.db import connections
+from rapidfuzz import fuzz, process
+
+from .matching import get_matcher, normalize
+from .versions import VersionedCache
+
+logger = logging.getLogger(__name__)
+
+FUZZY_CUTOFF = 75
+
+
+class IngredientPrefixIndex:
+    """
+    Sorted array of normalized ingredient names, searched with bisect.
+    Every word start of a name is indexed, so "pep" finds both "pepper" and "black pepper".
+    """
+
+    def __init__(self, rows):
+        self.names = {}
+        entries = []
+        for id_, name in rows:
+            norm = normalize(name)
+            if not norm:
+                continue
+            self.names[id_] = name
+            words = norm.split()
+            for i in range(len(words)):
+                entries.append((' '.join(words[i:]), i, id_))
+        entries.sort()
+        self.keys = [key for key, _, _ in entries]
+        self.entries = entries
+
+    def prefix_matches(self, prefix, limit):
+        # Collect a few extra hits so full-name prefixes can be ranked above word-inside hits
+        found = {}
+        for key, position, id_ in self.entries[bisect_left(self.keys, prefix):]:
+            if not key.startswith(prefix) or len(found) >= limit * 4:
+                break
+            found[id_] = min(found.get(id_, position), position)
+        ranked = sorted(found, key=lambda id_: (found[id_] > 0, len(self.names[id_]), self.names[id_]))
+        return ranked[:limit]
+
+    def complete(self, text, limit=10):
+        query = normalize(text)
+        if not query:
+            return []
+        ids = self.prefix_matches(query, limit)
+        if len(ids) < limit:
+            # Misspelled input: score only the matcher's pruned candidates
+            choices = {
+                id_: name for id_, name in get_matcher().candidates(query).items()
+                if id_ not in ids and id_ in self.names
+            }
+            fuzzy = process.extract(query, choices, scorer=fuzz.WRatio, limit=limit - len(ids), score_cutoff=FUZZY_CUTOFF)
+            ids.extend(key for _, _, key in fuzzy)
+        return [(id_, self.names[id_]) for id_ in ids]
+
+
+def _build_index():
+    from .models import Ingredient
+    return IngredientPrefixIndex(Ingredient.objects.values_list('id', 'name').iterator())
+
+
+_index = VersionedCache('ingredients', _build_index)
+
+
+def get_autocomplete_index():
+    return _index.get()
+
+
+def warm_up():
+    """
+    Build the ingredient indexes ahead of the first request. Called when the WSGI/ASGI
+    application is imported, so it never raises: on failure the indexes are built on first use.
+    """
+    try:
+        get_matcher()
+        get_autocomplete_index()
+    except Exception:
+        logger.warning("Could not warm ingredient indexes; they will be built on first use.", exc_info=True)
+    finally:
+        # A preforking server would otherwise share this connection's socket with its workers
+        connections.close_all()
@@ -0,0 +1,44 @@
+"""
+Runs work off the request path once the current transaction commits: as a Celery task
+when CELERY_BROKER_URL is configured, otherwise on a small in-process thread pool.
+BACKGROUND_TASKS_EAGER runs it inline instead (local runs and tests).
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def _run_in_thread(func, args):
+    close_old_connections()
+    try:
+        func(*args)
+    except Exception:
+        logger.exception("Background job %s%r failed.", func.__qualname__, args)
+    finally:
+        close_old_connections()
+
+
+def _dispatch(func, args):
+    global _executor
+    if settings.BACKGROUND_TASKS_EAGER:
+        func(*args)
+    elif settings.CELERY_BROKER_URL:
+        from .tasks import run_job
+        run_job.delay(f'{func.__module__}.{func.__qualname__}', *args)
+    else:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.BACKGROUND_TASKS_WORKERS, thread_name_prefix='background'
+            )
+        _executor.submit(_run_in_thread, func, args)
+
+
+def run_after_commit(func, *args):
+    """Schedule module-level `func(*args)`; args must be JSON-serializable for Celery."""
+    transaction.on_commit(lambda: _dispatch(func, args))
@@ -0,0 +1,105 @@
+import hashlib
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.renderers import JSONRenderer
+
+from .versions import get_stamps
+
+
+class ConditionalGetMixin:
+    """
+    Answers If-None-Match / If-Modified-Since with a 304 before the view queries or
+    serializes anything. Views supply validators from cheap version stamps through
+    get_validators; returning (None, None) disables conditional handling.
+    """
+
+    def get_validators(self, request, kwargs):
+        """Return (etag, last_modified) where last_modified is a unix timestamp."""
+        return None, None
+
+    def get(self, request, *args, **kwargs):
+        etag, last_modified = self.get_validators(request, kwargs)
+        if last_modified is not None:
+            last_modified = int(last_modified)
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = self.build_response(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+
+        if etag is not None:
+            response.headers['ETag'] = etag
+        if last_modified is not None:
+            response.headers['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def build_response(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    def get_scope_stamps(self, scopes):
+        """Version stamps of `scopes`, read once per request (views are instantiated per request)."""
+        scopes = tuple(scopes)
+        if not hasattr(self, '_scope_stamps'):
+            self._scope_stamps = {}
+        if scopes not in self._scope_stamps:
+            self._scope_stamps[scopes] = get_stamps(scopes)
+        return self._scope_stamps[scopes]
+
+
+class SharedResponseCacheMixin(ConditionalGetMixin):
+    """
+    Caches the rendered JSON body of successful GET responses in the shared cache.
+    Keys embed the version from get_cache_version, by default the current version of
+    every scope in `cache_scopes`, so writes that bump a scope (see signals) make stale
+    entries unreachable without waiting for a TTL. The same key doubles as the ETag for
+    conditional GETs. Bodies carry per-user is_favorited flags, so signed-in users get
+    their own entries.
+    """
+    cache_scopes = ('recipes', 'reviews', 'ingredients')
+    cache_timeout = 60 * 60
+
+    def get_cache_scopes(self, request):
+        if request.user.is_authenticated:
+            return self.cache_scopes + (f'favorites:{request.user.pk}',)
+        return self.cache_scopes
+
+    def get_cache_version(self, request, kwargs):
+        """Return (version, last_modified) of the data behind the response, or (None, None) to bypass the cache."""
+        stamps = self.get_scope_stamps(self.get_cache_scopes(request))
+        versions = ':'.join(str(version) for version, _ in stamps.values())
+        return versions, max(modified for _, modified in stamps.values())
+
+    def get_cache_key(self, request, kwargs):
+        """Return None to bypass the cache for this request."""
+        if not hasattr(self, '_cache_version'):
+            self._cache_version = self.get_cache_version(request, kwargs)
+        version = self._cache_version[0]
+        if version is None:
+            return None
+        params = '&'.join(f'{k}={v}' for k, v in sorted(request.query_params.lists()))
+        raw = f'{request.get_host()}|{request.path}|{params}|{sorted(kwargs.items())}|{request.user.pk}|{version}'
+        return f'response:{type(self).__name__}:{hashlib.md5(raw.encode()).hexdigest()}'
+
+    def get_validators(self, request, kwargs):
+        # The versioned cache key already changes whenever the response could
+        key = self.get_cache_key(request, kwargs)
+        if key is None:
+            return None, None
+        return f'"{hashlib.md5(key.encode()).hexdigest()}"', self._cache_version[1]
+
+    def build_response(self, request, *args, **kwargs):
+        key = self.get_cache_key(request, kwargs)
+        if key is not None and (body := cache.get(key)) is not None:
+            return HttpResponse(body, content_type='application/json')
+
+        response = super().build_response(request, *args, **kwargs)
+        if key is None or response.status_code != 200:
+            return response
+
+        body = JSONRenderer().render(response.data)
+        cache.set(key, body, self.cache_timeout)
+        return HttpResponse(body, content_type='application/json')
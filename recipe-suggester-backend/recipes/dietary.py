@@ -0,0 +1,135 @@
+from itertools import chain
+
+import numpy as np
+from django.utils import timezone
+
+from .versions import VersionedCache, bump_version
+
+FLAG_FIELDS = (
+    'is_meat', 'is_dairy', 'contains_gluten',
+    'is_vegan_safe', 'is_nut_free', 'is_keto_friendly',
+)
+
+# One bit per property that rules a diet out, so a recipe's flags are the OR of its ingredients'
+MEAT = 1 << 0
+DAIRY = 1 << 1
+GLUTEN = 1 << 2
+NOT_VEGAN_SAFE = 1 << 3
+NUTS = 1 << 4
+NOT_KETO = 1 << 5
+
+
+def ingredient_flags(is_meat, is_dairy, contains_gluten, is_vegan_safe, is_nut_free, is_keto_friendly):
+    return (
+        (MEAT if is_meat else 0)
+        | (DAIRY if is_dairy else 0)
+        | (GLUTEN if contains_gluten else 0)
+        | (0 if is_vegan_safe else NOT_VEGAN_SAFE)
+        | (0 if is_nut_free else NUTS)
+        | (0 if is_keto_friendly else NOT_KETO)
+    )
+
+
+def tags_from_flags(flags):
+    tags = set()
+    if flags & MEAT:
+        tags.add('contains_meat')
+    if flags & DAIRY:
+        tags.add('contains_dairy')
+    if flags & GLUTEN:
+        tags.add('contains_gluten')
+    if flags & NOT_VEGAN_SAFE:
+        tags.add('not_vegan')
+    if flags & NUTS:
+        tags.add('contains_nuts')
+
+    if not flags & (MEAT | DAIRY | NOT_VEGAN_SAFE):
+        tags.add('vegan')
+    if not flags & MEAT:
+        tags.add('vegetarian')
+    if not flags & NUTS:
+        tags.add('nut_free')
+    if not flags & NOT_KETO:
+        tags.add('keto_friendly')
+    return sorted(tags)
+
+
+# Only 64 flag combinations exist, so every tag list is computed up front
+TAGS_BY_FLAGS = [tags_from_flags(flags) for flags in range(1 << 6)]
+
+
+DIET_TAGS = frozenset(tag for tags in TAGS_BY_FLAGS for tag in tags)
+
+
+def parse_diets(value):
+    """Split a comma separated diet parameter, rejecting unknown tags."""
+    diets = [diet.strip() for diet in value.split(',') if diet.strip()]
+    unknown = [diet for diet in diets if diet not in DIET_TAGS]
+    if unknown:
+        raise ValueError(f"Unknown diet: {', '.join(unknown)}")
+    return diets
+
+
+class FlagTable:
+    """
+    Dietary flag bitmask per ingredient, stored in a uint8 array indexed by ingredient id.
+    """
+
+    def __init__(self, rows):
+        rows = list(rows)
+        size = max((row[0] for row in rows), default=0) + 1
+        self.flags = np.zeros(size, dtype=np.uint8)
+        self.known = np.zeros(size, dtype=bool)
+        for id_, *values in rows:
+            self.flags[id_] = ingredient_flags(*values)
+            self.known[id_] = True
+
+    def __contains__(self, ingredient_id):
+        return 0 <= ingredient_id < len(self.known) and bool(self.known[ingredient_id])
+
+    def tags_for(self, ingredient_ids):
+        return self.tag_many([ingredient_ids])[0]
+
+    def tag_many(self, id_lists):
+        """Dietary tags for many recipes' ingredient id lists with one OR-reduce."""
+        id_lists = list(id_lists)
+        lengths = np.fromiter((len(ids) for ids in id_lists), dtype=np.int64, count=len(id_lists))
+        ids = np.fromiter(chain.from_iterable(id_lists), dtype=np.int64, count=int(lengths.sum()))
+        # Unknown ids (deleted ingredients) contribute no flags
+        masks = self.flags[np.where((ids >= 0) & (ids < len(self.flags)), ids, 0)]
+
+        combined = np.zeros(len(id_lists), dtype=np.uint8)
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1])) if len(id_lists) else lengths
+        nonempty = lengths > 0
+        if nonempty.any():
+            combined[nonempty] = np.bitwise_or.reduceat(masks, starts[nonempty])
+        return [TAGS_BY_FLAGS[flags] for flags in combined.tolist()]
+
+
+def _build_flag_table():
+    from .models import Ingredient
+    return FlagTable(Ingredient.objects.values_list('id', *FLAG_FIELDS).iterator())
+
+
+_flag_table = VersionedCache('ingredients', _build_flag_table)
+
+
+def get_flag_table():
+    return _flag_table.get()
+
+
+def retag_recipes(recipes):
+    """Recompute and store dietary_tags for a Recipe queryset in bulk."""
+    from .models import Recipe
+    rows = list(recipes.values_list('id', 'ingredient_ids'))
+    if not rows:
+        return 0
+    tags = get_flag_table().tag_many(ids for _, ids in rows)
+    now = timezone.now()
+    Recipe.objects.bulk_update(
+        [Recipe(id=recipe_id, dietary_tags=t, updated_at=now) for (recipe_id, _), t in zip(rows, tags)],
+        ['dietary_tags', 'updated_at'],
+        batch_size=1000
+    )
+    bump_version('recipes')
+    return len(rows)
@@ -0,0 +1,115 @@
+"""
+Resized derivatives of uploaded images (recipe photos, profile pictures).
+
+process_image writes every VARIANTS size in each of FORMATS into a `derived/` folder
+next to the original, without EXIF/ICC/XMP metadata. It records their storage names in
+the model's `<field>_variants` JSON column. Serializers turn that map into URLs with
+variant_urls, so rendering a page never touches storage.
+"""
+import posixpath
+from io import BytesIO
+
+from django.apps import apps
+from django.core.files.base import ContentFile
+from django.db.models.functions import Now
+from PIL import Image, ImageOps
+
+from .background import run_after_commit
+from .versions import bump_version
+
+# Longest side in pixels; smaller originals are never upscaled
+VARIANTS = {'thumb': 200, 'card': 480, 'full': 1600}
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def derivative_name(name, variant, ext):
+    directory, filename = posixpath.split(name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, 'derived', f'{stem}.{variant}.{ext}')
+
+
+def _encode(image, fmt, options):
+    if fmt == 'JPEG' and image.mode == 'RGBA':
+        flat = Image.new('RGB', image.size, (255, 255, 255))
+        flat.paste(image, mask=image.getchannel('A'))
+        image = flat
+    buffer = BytesIO()
+    image.save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+
+def build_derivatives(field_file):
+    """Write every variant of field_file and return {'source': name, variant: {ext: name}}."""
+    storage = field_file.storage
+    with field_file.open('rb') as f, Image.open(f) as original:
+        original = ImageOps.exif_transpose(original)
+        has_alpha = original.mode in ('RGBA', 'LA', 'PA') or 'transparency' in original.info
+        base = original.convert('RGBA' if has_alpha else 'RGB')
+
+    variants = {'source': field_file.name}
+    for variant, size in VARIANTS.items():
+        image = base.copy()
+        image.thumbnail((size, size), Image.Resampling.LANCZOS)
+        # Encoders pick EXIF/ICC/XMP up from .info; drop it
+        image.info = {}
+        variants[variant] = {}
+        for ext, (fmt, options) in FORMATS.items():
+            name = derivative_name(field_file.name, variant, ext)
+            if storage.exists(name):
+                storage.delete(name)
+            variants[variant][ext] = storage.save(name, ContentFile(_encode(image, fmt, options)))
+    return variants
+
+
+def _stored_names(variants):
+    return {name for key, formats in variants.items() if key != 'source' for name in formats.values()}
+
+
+def process_image(model_label, pk, field_name, scope=None):
+    """Build derivatives for one instance's image field, replacing any stale ones."""
+    model = apps.get_model(model_label)
+    instance = model.objects.filter(pk=pk).first()
+    field_file = getattr(instance, field_name, None)
+    if not field_file:
+        return None
+
+    previous = getattr(instance, f'{field_name}_variants') or {}
+    variants = build_derivatives(field_file)
+    changes = {f'{field_name}_variants': variants}
+    if any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+        # Conditional GETs validate on updated_at, which update() doesn't touch by itself
+        changes['updated_at'] = Now()
+    # update() so saving the map doesn't re-run save() logic or signals
+    model.objects.filter(pk=pk).update(**changes)
+    for name in _stored_names(previous) - _stored_names(variants):
+        field_file.storage.delete(name)
+    if scope:
+        bump_version(scope)
+    return variants
+
+
+def needs_derivatives(instance, field_name):
+    field_file = getattr(instance, field_name)
+    return bool(field_file) and getattr(instance, f'{field_name}_variants', {}).get('source') != field_file.name
+
+
+def schedule_derivatives(instance, field_name, scope=None):
+    if needs_derivatives(instance, field_name):
+        run_after_commit(process_image, instance._meta.label_lower, instance.pk, field_name, scope)
+
+
+def variant_urls(field_file, variants, request=None):
+    """{variant: {ext: url}} for the current image, or {} until its derivatives exist."""
+    if not field_file or not variants or variants.get('source') != field_file.name:
+        return {}
+    storage = field_file.storage
+    return {
+        variant: {
+            ext: request.build_absolute_uri(storage.url(name)) if request else storage.url(name)
+            for ext, name in formats.items()
+        }
+        for variant, formats in variants.items() if variant != 'source'
+    }
@@ -0,0 +1,28 @@
+"""
+Background ingredient linking and dietary tagging for newly created recipes.
+
+CreateRecipeView saves recipes as PENDING, which makes Recipe.save skip the fuzzy
+matching; enqueue_indexing runs index_recipe off the request path once the recipe
+is committed (see recipes.background). Until then a recipe has no ingredient links, so
+suggestions and diet filters leave it out. Jobs the thread pool lost on restart, and
+recipes that FAILED, are picked up again by the index_pending_recipes command.
+"""
+from .background import run_after_commit
+from .models import Recipe
+
+
+def index_recipe(recipe_id):
+    recipe = Recipe.objects.filter(pk=recipe_id).first()
+    if recipe is None or recipe.indexing_status == Recipe.IndexingStatus.READY:
+        return
+    recipe.indexing_status = Recipe.IndexingStatus.READY
+    try:
+        # Only the indexed columns, so edits made while pending aren't overwritten
+        recipe.save(update_fields=['ingredient_ids', 'dietary_tags', 'indexing_status', 'updated_at'])
+    except Exception:
+        Recipe.objects.filter(pk=recipe_id).update(indexing_status=Recipe.IndexingStatus.FAILED)
+        raise
+
+
+def enqueue_indexing(recipe_id):
+    run_after_commit(index_recipe, recipe_id)
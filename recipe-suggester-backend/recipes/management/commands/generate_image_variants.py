@@ -0,0 +1,36 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from recipes.images import needs_derivatives, process_image
+from recipes.models import Recipe
+from recipes.versions import bump_version
+
+
+class Command(BaseCommand):
+    help = "Build resized WebP/JPEG derivatives for existing recipe images and profile pictures."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Rebuild derivatives that already exist.")
+
+    def handle(self, *args, **options):
+        targets = [
+            (Recipe, "image"),
+            (get_user_model(), "profile_picture"),
+        ]
+        processed = failed = 0
+        for model, field_name in targets:
+            instances = (
+                model.objects.exclude(**{field_name: ""}).exclude(**{f"{field_name}__isnull": True})
+                .only("pk", field_name, f"{field_name}_variants")
+            )
+            for instance in instances.iterator():
+                if not options["force"] and not needs_derivatives(instance, field_name):
+                    continue
+                try:
+                    process_image(instance._meta.label_lower, instance.pk, field_name)
+                    processed += 1
+                except OSError as exc:  # missing file or not an image
+                    failed += 1
+                    self.stderr.write(f"Skipping {instance._meta.label} {instance.pk}: {exc}")
+
+        bump_version("recipes")
+        self.stdout.write(self.style.SUCCESS(f"Built derivatives for {processed} images ({failed} failed)."))
@@ -0,0 +1,149 @@
+import csv
+import json
+import os
+import time
+from collections import deque
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from recipes.dietary import get_flag_table
+from recipes.matching import get_matcher, match_chunks
+from recipes.models import Recipe, RecipeIngredient
+from recipes.versions import bump_version
+
+
+TEXT_FIELDS = ('title', 'instructions', 'recipeIngred')
+
+
+def read_rows(path, fmt):
+    """Yield (line number, row) pairs; row is None when the line is not an object of text fields."""
+    with open(path, newline='', encoding='utf-8') as f:
+        if fmt == 'csv':
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+            return
+        for line_no, line in enumerate(f, start=1):
+            # Blank lines still count as rows so checkpoints line up with the file
+            if not line.strip():
+                yield line_no, {}
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield line_no, row if is_text_row(row) else None
+
+
+def is_text_row(row):
+    return isinstance(row, dict) and all(isinstance(row.get(field) or '', str) for field in TEXT_FIELDS)
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk import recipes from a JSON Lines or CSV dump with title, instructions and recipeIngred "
+        "fields. Ingredients are matched in worker processes and rows are inserted in batches. A "
+        "checkpoint file records progress, so an interrupted import resumes where it stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=str, help="Path to a .jsonl or .csv file.")
+        parser.add_argument('--format', choices=['jsonl', 'csv'], help="Input format (default: from the file extension).")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Number of matching processes.")
+        parser.add_argument('--batch-size', type=int, default=2000, help="Recipes matched and inserted per transaction.")
+        parser.add_argument('--checkpoint', type=str, help="Checkpoint file (default: <path>.checkpoint).")
+        parser.add_argument('--restart', action='store_true', help="Ignore an existing checkpoint and start over.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+        checkpoint = options['checkpoint'] or f"{path}.checkpoint"
+        batch_size = max(1, options['batch_size'])
+
+        done = 0 if options['restart'] else self.read_checkpoint(checkpoint, path)
+        if done:
+            self.stdout.write(f"Resuming after {done} rows.")
+
+        rows = islice(read_rows(path, fmt), done, None)
+        row_chunks = iter(lambda: list(islice(rows, batch_size)), [])
+        in_flight = deque()
+
+        def text_chunks():
+            # Workers only see the ingredient text; rows wait here in input order
+            for chunk in row_chunks:
+                in_flight.append(chunk)
+                yield [(i, (row or {}).get('recipeIngred') or '') for i, (_, row) in enumerate(chunk)]
+
+        flag_table = get_flag_table()
+        imported = skipped = 0
+        bad_lines = []
+        started = time.monotonic()
+        try:
+            for matched in match_chunks(text_chunks(), get_matcher(), max(1, options['workers'])):
+                chunk = in_flight.popleft()
+                malformed = [line_no for line_no, row in chunk if row is None]
+                if malformed:
+                    bad_lines.extend(malformed)
+                    self.stderr.write(f"Skipping malformed rows at lines {', '.join(map(str, malformed))}")
+                created = self.write_chunk([row for _, row in chunk], matched, flag_table)
+                imported += created
+                skipped += len(chunk) - created
+                done += len(chunk)
+                self.write_checkpoint(checkpoint, path, done)
+
+                elapsed = time.monotonic() - started
+                self.stdout.write(f"Imported {imported} recipes, {done} rows read ({imported / elapsed if elapsed else 0:.0f}/s)")
+        finally:
+            if imported:
+                # bulk_create sends no post_save, so refresh cached indexes explicitly
+                bump_version('recipes')
+                bump_version('recipe_links')
+                bump_version('recipe_ids')
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Import complete: {imported} recipes imported, {skipped} rows skipped "
+            f"({len(bad_lines)} malformed) in {elapsed:.1f}s."
+        ))
+
+    def write_chunk(self, chunk, matched, flag_table):
+        valid = [(row, ids) for row, (_, ids) in zip(chunk, matched) if row and (row.get('title') or '').strip()]
+        tags = flag_table.tag_many(ids for _, ids in valid)
+        recipes = [
+            Recipe(
+                title=row['title'].strip(),
+                instructions=row.get('instructions') or '',
+                recipeIngred=row.get('recipeIngred') or '',
+                ingredient_ids=ids,
+                dietary_tags=dietary_tags,
+            )
+            for (row, ids), dietary_tags in zip(valid, tags)
+        ]
+        with transaction.atomic():
+            Recipe.objects.bulk_create(recipes)
+            RecipeIngredient.objects.bulk_create(
+                [
+                    RecipeIngredient(recipe_id=recipe.id, ingredient_id=id_)
+                    for recipe in recipes for id_ in recipe.ingredient_ids if id_ in flag_table
+                ],
+                ignore_conflicts=True
+            )
+        return len(recipes)
+
+    def read_checkpoint(self, checkpoint, path):
+        try:
+            with open(checkpoint, encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return 0
+        if state.get('source') != os.path.abspath(path):
+            raise CommandError(f"{checkpoint} belongs to {state.get('source')}; pass --restart or --checkpoint.")
+        return state['rows']
+
+    def write_checkpoint(self, checkpoint, path, rows):
+        # Written after each committed batch, so a crash in between re-imports at most one batch
+        tmp = f"{checkpoint}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'source': os.path.abspath(path), 'rows': rows}, f)
+        os.replace(tmp, checkpoint)
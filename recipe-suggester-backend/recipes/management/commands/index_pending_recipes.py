@@ -0,0 +1,38 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+from recipes.indexing import index_recipe
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        "Link ingredients and tag diets inline for recipes that FAILED indexing or have been "
+        "PENDING longer than --older-than minutes, e.g. after a background job was lost on restart."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than", type=int, default=10,
+            help="Minutes a recipe must have been pending before it counts as stale."
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(minutes=options["older_than"])
+        stale = Recipe.objects.filter(
+            Q(indexing_status=Recipe.IndexingStatus.FAILED)
+            | Q(indexing_status=Recipe.IndexingStatus.PENDING, updated_at__lt=cutoff)
+        ).order_by("id").values_list("id", flat=True)
+
+        indexed = failed = 0
+        for recipe_id in stale.iterator():
+            try:
+                index_recipe(recipe_id)
+                indexed += 1
+            except Exception as exc:
+                failed += 1
+                self.stderr.write(f"Recipe {recipe_id} failed to index: {exc}")
+
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} stale recipes ({failed} failed)."))
@@ -1,49 +1,106 @@
 import csv
+import time
+from itertools import islice
+
 from django.core.management.base import BaseCommand
-from recipes.models import Ingredient
+from django.db import transaction
+from recipes.dietary import FLAG_FIELDS, retag_recipes
+from recipes.models import Ingredient, Recipe
+from recipes.versions import bump_version
 
 class Command(BaseCommand):
-    help = "Import or update ingredients with dietary tags from a CSV file."
+    help = (
+        "Import or update ingredients with dietary tags from a CSV file. "
+        "Rows are streamed and upserted in batches; progress is reported once per batch."
+    )
 
     def add_arguments(self, parser):
         parser.add_argument('csv_file', type=str, help="Path to the CSV file containing ingredients and tags.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows diffed and written per transaction.")
+        parser.add_argument('--dry-run', action='store_true', help="Report what would change without writing.")
+        parser.add_argument(
+            '--retag', action='store_true',
+            help="Recompute dietary tags of recipes using ingredients whose flags changed."
+        )
 
     def handle(self, *args, **kwargs):
-        csv_file = kwargs['csv_file']
-        with open(csv_file, newline='', encoding='utf-8') as f:
+        batch_size = kwargs['batch_size']
+        dry_run = kwargs['dry_run']
+        totals = dict.fromkeys(['rows', 'created', 'updated', 'unchanged', 'skipped'], 0)
+        changed_ids = []
+        started = time.monotonic()
+
+        with open(kwargs['csv_file'], newline='', encoding='utf-8') as f:
             reader = csv.DictReader(f)
-            created = 0
-            updated = 0
-            skipped = 0
-
-            for row in reader:
-                name = row.get('name')
-                if not name:
-                    self.stdout.write(self.style.WARNING("Skipping row without a name"))
-                    skipped += 1
-                    continue
-
-                defaults = {
-                    'is_meat': row.get('is_meat', '').lower() == 'true',
-                    'is_dairy': row.get('is_dairy', '').lower() == 'true',
-                    'contains_gluten': row.get('contains_gluten', '').lower() == 'true',
-                    'is_vegan_safe': row.get('is_vegan_safe', '').lower() == 'true',
-                    'is_nut_free': row.get('is_nut_free', '').lower() == 'true',
-                    'is_keto_friendly': row.get('is_keto_friendly', '').lower() == 'true',
-                }
-
-                ingredient, created_flag = Ingredient.objects.update_or_create(
-                    name=name.strip(),
-                    defaults=defaults
+            while (chunk := list(islice(reader, batch_size))):
+                changed_ids.extend(self.import_chunk(chunk, totals, dry_run))
+                elapsed = max(time.monotonic() - started, 1e-6)
+                self.stdout.write(
+                    f"{totals['rows']} rows ({totals['rows'] / elapsed:.0f} rows/s): "
+                    f"{totals['created']} created, {totals['updated']} updated, "
+                    f"{totals['unchanged']} unchanged, {totals['skipped']} skipped"
                 )
 
-                if created_flag:
-                    created += 1
-                    self.stdout.write(self.style.SUCCESS(f"Created: {name}"))
-                else:
-                    updated += 1
-                    self.stdout.write(self.style.NOTICE(f"Updated: {name}"))
+        prefix = "Dry run" if dry_run else "Import"
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix} complete: {totals['created']} created, {totals['updated']} updated, "
+            f"{totals['unchanged']} unchanged, {totals['skipped']} skipped."
+        ))
+        if dry_run or not (totals['created'] or totals['updated']):
+            return
 
-            self.stdout.write(self.style.SUCCESS(
-                f"Import complete: {created} created, {updated} updated, {skipped} skipped."
+        # Bulk writes skip the Ingredient signals, so invalidate the catalogue here
+        if changed_ids and kwargs['retag']:
+            bump_version('ingredients', then=lambda version: self.retag(changed_ids))
+        else:
+            bump_version('ingredients')
+        if changed_ids and not kwargs['retag']:
+            # Bulk writes skip the retagging the Ingredient signals would do
+            self.stdout.write(self.style.NOTICE(
+                f"Flags changed for {len(changed_ids)} ingredients; stored recipe dietary tags are stale. "
+                "Rerun with --retag, or run relink_recipes."
             ))
+        if totals['created']:
+            self.stdout.write(self.style.NOTICE("Run relink_recipes to match existing recipes against new ingredients."))
+
+    def retag(self, changed_ids):
+        retagged = retag_recipes(
+            Recipe.objects.filter(recipe_ingredients__ingredient_id__in=changed_ids).distinct()
+        )
+        self.stdout.write(self.style.SUCCESS(f"Retagged {retagged} recipes."))
+
+    def import_chunk(self, rows, totals, dry_run):
+        """Upsert one chunk with a single lookup query; returns ids of existing ingredients whose flags changed."""
+        wanted = {}
+        for row in rows:
+            totals['rows'] += 1
+            name = (row.get('name') or '').strip()
+            if not name:
+                totals['skipped'] += 1
+                continue
+            # Later rows win, as with sequential update_or_create
+            wanted[name] = tuple(row.get(field, '').lower() == 'true' for field in FLAG_FIELDS)
+
+        existing = {
+            name: (id_, tuple(flags))
+            for id_, name, *flags in Ingredient.objects.filter(name__in=wanted).values_list('id', 'name', *FLAG_FIELDS)
+        }
+        to_create = []
+        to_update = []
+        for name, flags in wanted.items():
+            if name not in existing:
+                to_create.append(Ingredient(name=name, **dict(zip(FLAG_FIELDS, flags))))
+            elif existing[name][1] != flags:
+                to_update.append(Ingredient(id=existing[name][0], **dict(zip(FLAG_FIELDS, flags))))
+        totals['created'] += len(to_create)
+        totals['updated'] += len(to_update)
+        totals['unchanged'] += len(wanted) - len(to_create) - len(to_update)
+
+        if not dry_run:
+            with transaction.atomic():
+                # Upsert in case another writer created the name since the lookup
+                Ingredient.objects.bulk_create(
+                    to_create, update_conflicts=True, unique_fields=['name'], update_fields=list(FLAG_FIELDS)
+                )
+                Ingredient.objects.bulk_update(to_update, FLAG_FIELDS)
+        return [ingredient.id for ingredient in to_update]
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from recipes.trending import reconcile_pantry_counts
+
+
+class Command(BaseCommand):
+    help = "Rebuild the stored pantry_count and trend_score columns from pantry items and reset the trending leaderboards."
+
+    def handle(self, *args, **options):
+        updated = reconcile_pantry_counts()
+        self.stdout.write(self.style.SUCCESS(f"Reconciled pantry counters for {updated} ingredients."))
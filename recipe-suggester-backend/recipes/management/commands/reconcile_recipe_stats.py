@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from recipes.stats import reconcile_recipe_stats
+
+
+class Command(BaseCommand):
+    help = "Rebuild the stored rating_sum/review_count/average_rating columns from reviews."
+
+    def handle(self, *args, **options):
+        updated = reconcile_recipe_stats()
+        self.stdout.write(self.style.SUCCESS(f"Reconciled review stats for {updated} recipes."))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from recipes.trending import TRENDING_SIZE, refresh_trending_recipes
+
+
+class Command(BaseCommand):
+    help = (
+        "Rank recipes by reviews and favorites in each trending window, rewrite the trending "
+        "table, and drop activity buckets older than every window. Also rebases ingredient "
+        "trend scores once their epoch is due."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size", type=int, default=TRENDING_SIZE, help="Recipes kept per window.")
+
+    def handle(self, *args, **options):
+        written = refresh_trending_recipes(size=options["size"])
+        summary = ", ".join(f"{window}: {count}" for window, count in written.items())
+        self.stdout.write(self.style.SUCCESS(f"Refreshed trending recipes ({summary})."))
@@ -0,0 +1,79 @@
+import os
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from recipes.matching import get_matcher, match_chunks
+from recipes.dietary import get_flag_table
+from recipes.models import Recipe, RecipeIngredient
+from recipes.versions import bump_version
+
+
+class Command(BaseCommand):
+    help = "Re-link recipes to the current ingredient catalogue and refresh their dietary tags."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ids', type=str, help="Comma separated recipe ids to relink.")
+        parser.add_argument('--since', type=int, help="Only relink recipes with an id greater than or equal to this.")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Number of matching processes.")
+        parser.add_argument('--chunk-size', type=int, default=500, help="Recipes matched and written per batch.")
+
+    def handle(self, *args, **options):
+        qs = Recipe.objects.order_by('id')
+        if options['ids']:
+            try:
+                qs = qs.filter(id__in=[int(x) for x in options['ids'].split(',') if x.strip()])
+            except ValueError:
+                raise CommandError("Invalid recipe IDs format.")
+        if options['since'] is not None:
+            qs = qs.filter(id__gte=options['since'])
+
+        chunk_size = max(1, options['chunk_size'])
+        workers = max(1, options['workers'])
+
+        flag_table = get_flag_table()
+        total = qs.count()
+
+        rows = qs.values_list('id', 'recipeIngred').iterator(chunk_size=chunk_size)
+        chunks = iter(lambda: list(islice(rows, chunk_size)), [])
+
+        # Workers only run the matcher; the parent does all database reads and writes
+        started = time.monotonic()
+        self.relink(match_chunks(chunks, get_matcher(), workers), flag_table, total, started)
+
+    def relink(self, results, flag_table, total, started):
+        done = 0
+        for matched in results:
+            self.write_chunk(matched, flag_table)
+            done += len(matched)
+            elapsed = time.monotonic() - started
+            self.stdout.write(f"Relinked {done}/{total} recipes ({done / elapsed if elapsed else 0:.0f}/s)")
+
+        # bulk_update does not send post_save, so refresh cached indexes explicitly
+        bump_version('recipes')
+        bump_version('recipe_links')
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"Relink complete: {done} recipes in {elapsed:.1f}s."))
+
+    def write_chunk(self, matched, flag_table):
+        tags = flag_table.tag_many(ingredient_ids for _, ingredient_ids in matched)
+        now = timezone.now()
+        recipes = []
+        links = []
+        for (recipe_id, ingredient_ids), dietary_tags in zip(matched, tags):
+            recipes.append(Recipe(
+                id=recipe_id, ingredient_ids=ingredient_ids, dietary_tags=dietary_tags, updated_at=now,
+                indexing_status=Recipe.IndexingStatus.READY
+            ))
+            links.extend(
+                RecipeIngredient(recipe_id=recipe_id, ingredient_id=id_)
+                for id_ in ingredient_ids if id_ in flag_table
+            )
+
+        with transaction.atomic():
+            # A relink is a full index, so it also settles recipes left pending or failed
+            Recipe.objects.bulk_update(recipes, ['ingredient_ids', 'dietary_tags', 'updated_at', 'indexing_status'])
+            RecipeIngredient.objects.filter(recipe_id__in=[r.id for r in recipes]).delete()
+            RecipeIngredient.objects.bulk_create(links)
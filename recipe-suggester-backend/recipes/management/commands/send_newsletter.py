@@ -1,14 +1,26 @@
 import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.core.mail import send_mail
+from django.core.mail import EmailMultiAlternatives, get_connection, send_mail
 from django.core.management.base import BaseCommand
 from django.template.loader import render_to_string
-from recipes.models import Recipe
+from django.utils import timezone
+from recipes.models import NewsletterDelivery, NewsletterIssue, Recipe
+from recipes.sampling import get_id_pool
+
+UNSUBSCRIBE_PLACEHOLDER = "NEWSLETTER-UNSUBSCRIBE-URL"
 
 class Command(BaseCommand):
-    help = "Send a weekly recipe newsletter to subscribed users"
+    help = (
+        "Send a weekly recipe newsletter to subscribed users. Each issue is recorded per user, "
+        "so rerunning after a failure only sends to users who haven't received it yet."
+    )
 
     def test_send_emails(self):
         recipe = Recipe.objects.create(
@@ -64,37 +76,143 @@ class Command(BaseCommand):
             )
             self.stdout.write(self.style.SUCCESS(f"Sent email to {email}"))
 
-    def send_emails(self):
-        users = get_user_model().objects.filter(is_subscribed=True)
-        if not users:
-            self.stdout.write(self.style.WARNING("No subscribed users found."))
-            return
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--issue', type=str,
+            help="Issue key; reruns with the same key skip users already sent to (default: current ISO week)."
+        )
+        parser.add_argument('--workers', type=int, default=4, help="Concurrent mail connections.")
+        parser.add_argument('--batch-size', type=int, default=100, help="Messages sent per worker task.")
 
-        recipe = random.choice(Recipe.objects.all())
+    def get_issue(self, key):
+        issue, _ = NewsletterIssue.objects.get_or_create(key=key)
+        if issue.recipe_id is None:
+            pool = get_id_pool()
+            if not len(pool):
+                return None
+            issue.recipe_id = int(random.choice(pool.ids))
+            issue.save(update_fields=['recipe'])
+        return issue
+
+    def send_emails(self, key, workers, batch_size):
+        issue = self.get_issue(key)
+        if issue is None:
+            self.stdout.write(self.style.WARNING("No recipes to send."))
+            return
 
+        recipe = issue.recipe
         subject = f"Weekly Recipe - {recipe.title}"
-        for user in users:
-            unsubscribe_url = (
-                f"{settings.SITE_URL}/api/users/unsubscribe?user_id={user.id}"
-            )
+        # Render once; only the unsubscribe link differs per user
+        template = render_to_string(
+            "recipes/newsletter.html",
+            {"recipe": recipe, "unsubscribe_url": UNSUBSCRIBE_PLACEHOLDER},
+        )
 
-            message = render_to_string(
-                "recipes/newsletter.html",
-                {
-                    "recipe": recipe,
-                    "unsubscribe_url": unsubscribe_url,
-                },
-            )
+        users = (
+            get_user_model().objects.filter(is_subscribed=True)
+            .exclude(newsletter_deliveries__issue=issue)
+            .order_by('pk').values_list('pk', 'email')
+            .iterator(chunk_size=batch_size)
+        )
+        batches = iter(lambda: list(islice(users, batch_size)), [])
+
+        mailer = BatchMailer(subject, template)
+        sent = failed = 0
+        started = time.monotonic()
+        try:
+            # Workers only talk SMTP; deliveries are recorded here as each batch lands
+            with ThreadPoolExecutor(max(1, workers)) as executor:
+                for batch, delivered, error in bounded_map(executor, mailer.send, batches, max(1, workers) * 2):
+                    NewsletterDelivery.objects.bulk_create(
+                        [NewsletterDelivery(issue=issue, user_id=pk) for pk, _ in delivered], ignore_conflicts=True
+                    )
+                    sent += len(delivered)
+                    if error is not None:
+                        failed += len(batch) - len(delivered)
+                        self.stderr.write(
+                            f"{len(batch) - len(delivered)} of a batch of {len(batch)} failed, "
+                            f"will retry on rerun: {error}"
+                        )
+                        continue
+                    elapsed = time.monotonic() - started
+                    self.stdout.write(f"Sent {sent} emails ({sent / elapsed if elapsed else 0:.0f}/s)")
+        finally:
+            mailer.close()
+
+        if not sent and not failed:
+            self.stdout.write(self.style.WARNING(f"No subscribed users left to send {issue} to."))
+            return
+        self.stdout.write(self.style.SUCCESS(f"Newsletter {issue}: {sent} sent, {failed} failed."))
 
-            send_mail(
-                subject,
-                message,
-                settings.DEFAULT_FROM_EMAIL,
-                [user.email],
-                fail_silently=False,
-                html_message=message,
-            )
-            self.stdout.write(self.style.SUCCESS(f"Sent email to {user.email}"))
-    
     def handle(self, *args, **options):
-        self.send_emails()
\ No newline at end of file
+        year, week, _ = timezone.localdate().isocalendar()
+        self.send_emails(options['issue'] or f"{year}-W{week:02d}", options['workers'], options['batch_size'])
+
+
+def bounded_map(executor, fn, iterable, window):
+    # Like executor.map, but only keeps `window` calls in flight
+    pending = deque()
+    for item in iterable:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+class BatchMailer:
+    """Sends batches of personalised copies over one reusable connection per worker thread."""
+
+    def __init__(self, subject, template):
+        self.subject = subject
+        self.template = template
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+
+    def connection(self):
+        if not hasattr(self.local, 'connection'):
+            self.local.connection = get_connection()
+            self.local.connection.open()
+            with self.lock:
+                self.connections.append(self.local.connection)
+        return self.local.connection
+
+    def message(self, pk, email):
+        html = self.template.replace(
+            UNSUBSCRIBE_PLACEHOLDER, f"{settings.SITE_URL}/api/users/unsubscribe?user_id={pk}"
+        )
+        message = EmailMultiAlternatives(self.subject, html, settings.DEFAULT_FROM_EMAIL, [email])
+        message.attach_alternative(html, "text/html")
+        return message
+
+    def send(self, batch):
+        """
+        Returns (batch, delivered, error) so one bad batch doesn't stop the run. Messages go out
+        one at a time on the pooled connection, so `delivered` holds exactly the (pk, email)
+        pairs the backend accepted before `error` stopped the batch.
+        """
+        delivered = []
+        try:
+            connection = self.connection()
+            for pk, email in batch:
+                if not connection.send_messages([self.message(pk, email)]):
+                    raise OSError(f"Mail backend did not accept the message to {email}")
+                delivered.append((pk, email))
+        except Exception as exc:
+            # Drop the connection; the next batch on this thread reconnects
+            self.close_thread_connection()
+            return batch, delivered, exc
+        return batch, delivered, None
+
+    def close_thread_connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is not None:
+            del self.local.connection
+            with self.lock:
+                self.connections.remove(connection)
+            connection.close()
+
+    def close(self):
+        for connection in self.connections:
+            connection.close()
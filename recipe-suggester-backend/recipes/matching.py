@@ -0,0 +1,129 @@
+import re
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+
+from rapidfuzz import fuzz, process
+
+from .versions import VersionedCache
+
+NON_ALPHA_RE = re.compile(r'[^a-zA-Z\s]')
+SCORE_CUTOFF = 70
+MAX_CANDIDATES = 25
+# A shared whole word counts as much as several shared trigrams
+TOKEN_WEIGHT = 3
+
+
+def normalize(text):
+    return ' '.join(NON_ALPHA_RE.sub('', text).lower().split())
+
+
+def trigrams(text):
+    padded = f' {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class IngredientMatcher:
+    """
+    In-memory index over the ingredient catalogue.
+    Exact names are resolved with a dict lookup; everything else is scored with
+    rapidfuzz against a small candidate set pruned through token/trigram postings.
+    """
+
+    def __init__(self, rows):
+        self.names = {}
+        self.exact = {}
+        self.token_index = defaultdict(set)
+        self.gram_index = defaultdict(set)
+
+        for id_, name in rows:
+            norm = normalize(name)
+            if not norm:
+                continue
+            self.names[id_] = norm
+            self.exact.setdefault(norm, id_)
+            for token in norm.split():
+                self.token_index[token].add(id_)
+            for gram in trigrams(norm):
+                self.gram_index[gram].add(id_)
+
+    def candidates(self, phrase):
+        counts = Counter()
+        for token in phrase.split():
+            counts.update(dict.fromkeys(self.token_index.get(token, ()), TOKEN_WEIGHT))
+        for gram in trigrams(phrase):
+            counts.update(self.gram_index.get(gram, ()))
+        return {id_: self.names[id_] for id_, _ in counts.most_common(MAX_CANDIDATES)}
+
+    def match_phrase(self, phrase):
+        if phrase in self.exact:
+            return self.exact[phrase]
+        choices = self.candidates(phrase)
+        if not choices:
+            return None
+        match = process.extractOne(phrase, choices, scorer=fuzz.partial_ratio, score_cutoff=SCORE_CUTOFF)
+        return match[2] if match else None
+
+    def match_line(self, line):
+        # Prefer the longest leading phrase that matches something
+        words = normalize(line).split()
+        for i in range(len(words), 0, -1):
+            id_ = self.match_phrase(' '.join(words[:i]))
+            if id_ is not None:
+                return id_
+        return None
+
+    def match(self, text):
+        """Return the ids of ingredients mentioned in a recipe's ingredient text, in order."""
+        matched = {}
+        for line in text.splitlines():
+            id_ = self.match_line(line)
+            if id_ is not None:
+                matched.setdefault(id_, None)
+        return list(matched)
+
+
+def _build_matcher():
+    from .models import Ingredient
+    rows = Ingredient.objects.order_by('id').values_list('id', 'name')
+    return IngredientMatcher(rows.iterator())
+
+
+_matcher = VersionedCache('ingredients', _build_matcher)
+
+
+def get_matcher():
+    return _matcher.get()
+
+
+# Set once per worker process by the pool initializer
+_worker_matcher = None
+
+
+def _init_worker(matcher):
+    global _worker_matcher
+    _worker_matcher = matcher
+
+
+def _match_chunk(chunk):
+    return [(key, _worker_matcher.match(text)) for key, text in chunk]
+
+
+def match_chunks(chunks, matcher, workers=1):
+    """
+    Yield [(key, ingredient_ids)] for every [(key, text)] chunk, in input order.
+    With several workers, matching fans out over processes with only 2 * workers
+    chunks in flight, so huge inputs are never materialized.
+    """
+    if workers <= 1:
+        for chunk in chunks:
+            yield [(key, matcher.match(text)) for key, text in chunk]
+        return
+
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(matcher,)) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(_match_chunk, chunk))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,49 @@
+# Generated by Django 5.0.1 on 2026-10-18 17:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_recipe_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+
+    known = set(Ingredient.objects.values_list('id', flat=True))
+    batch = []
+    for recipe_id, ingredient_ids in Recipe.objects.values_list('id', 'ingredient_ids').iterator():
+        batch.extend(
+            RecipeIngredient(recipe_id=recipe_id, ingredient_id=id_)
+            for id_ in set(ingredient_ids or []) if id_ in known
+        )
+        if len(batch) >= 5000:
+            RecipeIngredient.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    RecipeIngredient.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_note'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeIngredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recipe_ingredients', to='recipes.ingredient')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recipe_ingredients', to='recipes.recipe')),
+            ],
+            options={
+                'unique_together': {('recipe', 'ingredient')},
+            },
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredients',
+            field=models.ManyToManyField(blank=True, related_name='recipes', through='recipes.RecipeIngredient', to='recipes.ingredient'),
+        ),
+        migrations.RunPython(backfill_recipe_ingredients, migrations.RunPython.noop),
+    ]
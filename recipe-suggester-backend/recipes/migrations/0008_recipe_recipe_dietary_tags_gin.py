@@ -0,0 +1,72 @@
+# Generated by Django 5.0.1 on 2026-10-18 17:54
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+# The tag rules as of this migration, frozen so later changes to recipes.dietary don't alter it
+FLAG_FIELDS = (
+    'is_meat', 'is_dairy', 'contains_gluten',
+    'is_vegan_safe', 'is_nut_free', 'is_keto_friendly',
+)
+
+
+def dietary_tags(ingredient_flags):
+    meat = any(flags[0] for flags in ingredient_flags)
+    dairy = any(flags[1] for flags in ingredient_flags)
+    gluten = any(flags[2] for flags in ingredient_flags)
+    not_vegan = not all(flags[3] for flags in ingredient_flags)
+    nuts = not all(flags[4] for flags in ingredient_flags)
+    not_keto = not all(flags[5] for flags in ingredient_flags)
+
+    tags = set()
+    if meat:
+        tags.add('contains_meat')
+    if dairy:
+        tags.add('contains_dairy')
+    if gluten:
+        tags.add('contains_gluten')
+    if not_vegan:
+        tags.add('not_vegan')
+    if nuts:
+        tags.add('contains_nuts')
+
+    if not (meat or dairy or not_vegan):
+        tags.add('vegan')
+    if not meat:
+        tags.add('vegetarian')
+    if not nuts:
+        tags.add('nut_free')
+    if not not_keto:
+        tags.add('keto_friendly')
+    return sorted(tags)
+
+
+def backfill_dietary_tags(apps, schema_editor):
+    # Rewrite every recipe's tags in canonical (sorted) form so containment lookups are reliable
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    Recipe = apps.get_model('recipes', 'Recipe')
+
+    flags = {id_: values for id_, *values in Ingredient.objects.values_list('id', *FLAG_FIELDS)}
+    batch = []
+    for recipe_id, ingredient_ids in Recipe.objects.values_list('id', 'ingredient_ids').iterator():
+        known = [flags[id_] for id_ in ingredient_ids or [] if id_ in flags]
+        batch.append(Recipe(id=recipe_id, dietary_tags=dietary_tags(known)))
+        if len(batch) >= 1000:
+            Recipe.objects.bulk_update(batch, ['dietary_tags'])
+            batch = []
+    Recipe.objects.bulk_update(batch, ['dietary_tags'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipeingredient_recipe_ingredients'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['dietary_tags'], name='recipe_dietary_tags_gin', opclasses=['jsonb_path_ops']),
+        ),
+        migrations.RunPython(backfill_dietary_tags, migrations.RunPython.noop),
+    ]
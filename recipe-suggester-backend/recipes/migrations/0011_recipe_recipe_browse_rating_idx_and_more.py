@@ -0,0 +1,22 @@
+# Generated by Django 5.0.1 on 2026-10-18 17:57
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipe_average_rating_recipe_rating_sum_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(models.OrderBy(django.db.models.functions.comparison.Coalesce('average_rating', models.Value(0.0)), descending=True), models.OrderBy(models.F('id'), descending=True), name='recipe_browse_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(models.OrderBy(models.F('review_count'), descending=True), models.OrderBy(models.F('id'), descending=True), name='recipe_browse_reviews_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.0.1 on 2026-10-18 18:03
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_pantry_counts(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    PantryItem = apps.get_model('recipes', 'PantryItem')
+
+    counts = (
+        PantryItem.objects.filter(ingredient=OuterRef('pk')).values('ingredient')
+        .annotate(total=Count('id')).values('total')
+    )
+    Ingredient.objects.update(pantry_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='pantry_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='trend_score',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(models.OrderBy(models.F('pantry_count'), descending=True), models.OrderBy(models.F('id')), name='ingredient_pantry_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(models.OrderBy(models.F('trend_score'), descending=True), models.OrderBy(models.F('id')), name='ingredient_trend_score_idx'),
+        ),
+        migrations.RunPython(backfill_pantry_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.0.1 on 2026-10-18 18:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_ingredient_pantry_count_ingredient_trend_score_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('reviews', models.PositiveIntegerField(default=0)),
+                ('favorites', models.IntegerField(default=0)),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity', to='recipes.recipe')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hour'], name='recipes_rec_hour_560834_idx')],
+                'unique_together': {('recipe', 'hour')},
+            },
+        ),
+        migrations.CreateModel(
+            name='TrendingRecipe',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window', models.CharField(max_length=8)),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trending_entries', to='recipes.recipe')),
+            ],
+            options={
+                'unique_together': {('window', 'rank')},
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.0.1 on 2026-10-18 18:23
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0018_catalogueversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendEpoch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='pantryitem',
+            name='added_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -1,5 +1,14 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Coalesce
 from django.conf import settings
+from django.utils import timezone
+
+from .dietary import get_flag_table
+from .matching import get_matcher
+
 
 class Ingredient(models.Model):
     name = models.CharField(max_length=1000, unique=True)
@@ -9,10 +18,20 @@ class Ingredient(models.Model):
     is_vegan_safe = models.BooleanField(default=True)
     is_nut_free = models.BooleanField(default=True)
     is_keto_friendly = models.BooleanField(default=False)
+    # Pantry popularity, maintained on pantry writes (see trending.record_pantry_change)
+    pantry_count = models.PositiveIntegerField(default=0)
+    trend_score = models.FloatField(default=0.0)
+
+    class Meta:
+        indexes = [
+            models.Index(F('pantry_count').desc(), F('id').asc(), name='ingredient_pantry_count_idx'),
+            models.Index(F('trend_score').desc(), F('id').asc(), name='ingredient_trend_score_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+
 class PantryItem(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -24,6 +43,8 @@ class PantryItem(models.Model):
         on_delete=models.CASCADE,
         related_name="pantry_items"
     )
+    # Removals take off the trend weight of this time (see trending.record_pantry_change)
+    added_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         unique_together = ('user', 'ingredient')
@@ -31,73 +52,156 @@ class PantryItem(models.Model):
     def __str__(self):
         return self.ingredient.name
 
+
 class Recipe(models.Model):
     title = models.CharField(max_length=1000)
     instructions = models.TextField()
     recipeIngred = models.TextField()
     image = models.ImageField(upload_to='recipes/Images/', blank=True, null=True)
+    # Resized copies of `image`, written by recipes.images.process_image
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     dietary_tags = models.JSONField(default=list)
     ingredient_ids = models.JSONField(default=list)
+    # Weighted title > ingredients > instructions, kept up to date by Postgres
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector('title', weight='A', config='english')
+            + SearchVector('recipeIngred', weight='B', config='english')
+            + SearchVector('instructions', weight='C', config='english')
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class IndexingStatus(models.TextChoices):
+        PENDING = 'pending'
+        READY = 'ready'
+        FAILED = 'failed'
+
+    # PENDING recipes skip ingredient matching in save() until recipes.indexing picks them up
+    indexing_status = models.CharField(
+        max_length=10, choices=IndexingStatus.choices, default=IndexingStatus.READY
+    )
+    # Review aggregates, maintained on review writes (see stats.apply_rating_change)
+    rating_sum = models.PositiveIntegerField(default=0)
+    review_count = models.PositiveIntegerField(default=0)
+    average_rating = models.FloatField(null=True, blank=True)
+    ingredients = models.ManyToManyField(
+        Ingredient,
+        through='RecipeIngredient',
+        related_name='recipes',
+        blank=True
+    )
+
+    class Meta:
+        indexes = [
+            # Serves dietary_tags__contains (jsonb @>) lookups
+            GinIndex(fields=['dietary_tags'], name='recipe_dietary_tags_gin', opclasses=['jsonb_path_ops']),
+            GinIndex(fields=['search_vector'], name='recipe_search_vector_gin'),
+            # Serves the misspelling fallback (title %> query)
+            GinIndex(fields=['title'], name='recipe_title_trgm', opclasses=['gin_trgm_ops']),
+            # Keyset browsing by rating / review count (see KeysetPagination)
+            models.Index(
+                Coalesce('average_rating', models.Value(0.0)).desc(), F('id').desc(),
+                name='recipe_browse_rating_idx'
+            ),
+            models.Index(F('review_count').desc(), F('id').desc(), name='recipe_browse_reviews_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
     @property
     def cleaned_ingredients(self):
-        from rapidfuzz import fuzz, process
-        import re
-
-        known_ingredients = Ingredient.objects.all().values_list('id', 'name')
-        name_map = {name.lower(): id_ for id_, name in known_ingredients}
-        matched_ids = set()
-
-        for line in self.recipeIngred.lower().splitlines():
-            cleaned = re.sub(r'[^a-zA-Z\s]', '', line).strip()
-            words = cleaned.split()
-            for i in range(len(words), 0, -1):
-                phrase = ' '.join(words[:i])
-                match = process.extractOne(phrase, name_map.keys(), scorer=fuzz.partial_ratio, score_cutoff=70)
-                if match:
-                    matched_ids.add(name_map[match[0]])
-                    break
-
-        return Ingredient.objects.filter(id__in=matched_ids)
+        # Read from the stored ids; fuzzy matching only happens in save()
+        if hasattr(self, '_prefetched_ingredients'):
+            return self._prefetched_ingredients
+        by_id = Ingredient.objects.in_bulk(self.ingredient_ids)
+        return [by_id[id_] for id_ in self.ingredient_ids if id_ in by_id]
 
     def compute_dietary_tags(self):
-        tags = set()
-        vegan = vegetarian = nut_free = keto = True
-        ingredients = Ingredient.objects.filter(id__in=self.ingredient_ids)
-
-        for ing in ingredients:
-            if ing.is_meat:
-                vegan = vegetarian = False
-                tags.add('contains_meat')
-            if ing.is_dairy:
-                vegan = False
-                tags.add('contains_dairy')
-            if ing.contains_gluten:
-                tags.add('contains_gluten')
-            if not ing.is_vegan_safe:
-                vegan = False
-                tags.add('not_vegan')
-            if not ing.is_nut_free:
-                nut_free = False
-                tags.add('contains_nuts')
-            if not ing.is_keto_friendly:
-                keto = False
-
-        if vegan: tags.add('vegan')
-        if vegetarian: tags.add('vegetarian')
-        if nut_free: tags.add('nut_free')
-        if keto: tags.add('keto_friendly')
-
-        return list(tags)
+        return get_flag_table().tags_for(self.ingredient_ids)
 
     def save(self, *args, **kwargs):
         # Only run fuzzy logic on save
-        self.ingredient_ids = [ing.id for ing in self.cleaned_ingredients]
-        self.dietary_tags = self.compute_dietary_tags()
+        indexed = self.indexing_status != self.IndexingStatus.PENDING
+        if indexed:
+            previous = self.ingredient_ids
+            self.ingredient_ids = get_matcher().match(self.recipeIngred)
+            self.dietary_tags = self.compute_dietary_tags()
+            # Read by the post_save signal; title or image edits leave the suggestion index alone
+            update_fields = kwargs.get('update_fields')
+            self._links_changed = (
+                self._state.adding or self.ingredient_ids != previous
+                or (update_fields is not None and 'indexing_status' in update_fields)
+            )
         super().save(*args, **kwargs)
+        self.__dict__.pop('_prefetched_ingredients', None)
+        if indexed:
+            self.sync_recipe_ingredients()
+
+    def sync_recipe_ingredients(self):
+        # Mirror ingredient_ids into the join table so the database can do set arithmetic
+        flag_table = get_flag_table()
+        ids = {id_ for id_ in self.ingredient_ids if id_ in flag_table}
+        RecipeIngredient.objects.filter(recipe=self).exclude(ingredient_id__in=ids).delete()
+        RecipeIngredient.objects.bulk_create(
+            [RecipeIngredient(recipe=self, ingredient_id=id_) for id_ in self.ingredient_ids if id_ in ids],
+            ignore_conflicts=True
+        )
+
+
+def prefetch_ingredients(recipes):
+    """
+    Resolve cleaned_ingredients for many recipes with a single Ingredient query.
+    """
+    wanted = {id_ for recipe in recipes for id_ in recipe.ingredient_ids}
+    by_id = Ingredient.objects.in_bulk(wanted) if wanted else {}
+    for recipe in recipes:
+        recipe._prefetched_ingredients = [
+            by_id[id_] for id_ in recipe.ingredient_ids if id_ in by_id
+        ]
+    return recipes
+
+
+def favorite_ids(user, recipe_ids):
+    """The subset of recipe_ids the user has favorited, in one through-table query."""
+    if user is None or not user.is_authenticated or not recipe_ids:
+        return set()
+    return set(
+        Recipe.favorited_by.through.objects
+        .filter(customuser_id=user.pk, recipe_id__in=recipe_ids)
+        .values_list('recipe_id', flat=True)
+    )
+
+
+def prefetch_favorites(recipes, user):
+    """Set _is_favorited on every recipe for serializers to read."""
+    favorites = favorite_ids(user, [recipe.pk for recipe in recipes])
+    for recipe in recipes:
+        recipe._is_favorited = recipe.pk in favorites
+    return recipes
+
+
+class RecipeIngredient(models.Model):
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="recipe_ingredients"
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name="recipe_ingredients"
+    )
+
+    class Meta:
+        unique_together = ('recipe', 'ingredient')
+
+    def __str__(self):
+        return f"{self.recipe_id}: {self.ingredient_id}"
+
 
 class Review(models.Model):
     recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, related_name="reviews")
@@ -106,6 +210,7 @@ class Review(models.Model):
     rating = models.IntegerField(choices=[(i, f"{i} star") for i in range(1, 6)])
     timestamp = models.DateTimeField(auto_now_add=True)
 
+
 class Note(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -124,4 +229,87 @@ class Note(models.Model):
     class Meta:
         unique_together = ('user','recipe')
     def __str__(self):
-        return f"Note by {self.user.username} on {self.recipe.title}"
\ No newline at end of file
+        return f"Note by {self.user.username} on {self.recipe.title}"
+
+
+class RecipeActivity(models.Model):
+    """Hourly rollup of review and favorite events, folded into TrendingRecipe by refresh_trending_recipes."""
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="activity"
+    )
+    hour = models.DateTimeField()
+    reviews = models.PositiveIntegerField(default=0)
+    # Net favorites (adds minus removals) within the hour
+    favorites = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('recipe', 'hour')
+        indexes = [models.Index(fields=['hour'])]
+
+
+class TrendingRecipe(models.Model):
+    """Materialized top-N per trending window, rewritten on every refresh."""
+    window = models.CharField(max_length=8)
+    rank = models.PositiveSmallIntegerField()
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="trending_entries"
+    )
+    score = models.FloatField()
+
+    class Meta:
+        unique_together = ('window', 'rank')
+
+
+class TrendEpoch(models.Model):
+    """Single row: the reference time of Ingredient.trend_score weights, moved by trending.rebase_trend_scores."""
+    started_at = models.DateTimeField()
+
+    def __str__(self):
+        return self.started_at.isoformat()
+
+
+class NewsletterIssue(models.Model):
+    """One newsletter send (e.g. an ISO week); reruns of the same key reuse its recipe."""
+    key = models.CharField(max_length=32, unique=True)
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name="newsletter_issues"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.key
+
+
+class NewsletterDelivery(models.Model):
+    """Recorded once a user's copy of an issue was handed to the mail backend."""
+    issue = models.ForeignKey(
+        NewsletterIssue,
+        on_delete=models.CASCADE,
+        related_name="deliveries"
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="newsletter_deliveries"
+    )
+    sent_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('issue', 'user')
+
+
+class CatalogueVersion(models.Model):
+    """Version stamp of one cache scope (see recipes.versions), shared by every process."""
+    scope = models.CharField(max_length=200, primary_key=True)
+    version = models.BigIntegerField()
+    modified = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.scope}@{self.version}"
@@ -0,0 +1,112 @@
+import base64
+import binascii
+import json
+
+from django.db import connection
+from django.db.models import F, Field, Func, Value
+from django.db.models.lookups import GreaterThan, LessThan
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination that seeks past the last row's sort key instead of using OFFSET,
+    so every page costs the same. The total count is opt-in: ?count=exact or ?count=estimate
+    (the planner's row estimate from pg_class, only meaningful for unfiltered querysets).
+    """
+    page_size = 20
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    # Each ordering is a list of (field, descending); the last field must be unique and every
+    # field must sort the same way, so a cursor is one row-value comparison
+    orderings = {
+        'id': [('id', False)],
+        'rating': [('rating_key', True), ('id', True)],
+        'reviews': [('review_count', True), ('id', True)],
+    }
+    sort_aliases = {'trending': 'reviews'}
+    key_types = {'id': int, 'rating_key': (int, float), 'review_count': int}
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        params = request.query_params
+
+        sort = params.get('sort', 'id')
+        sort = self.sort_aliases.get(sort, sort)
+        if sort not in self.orderings:
+            raise ValidationError({"sort": f"Unknown sort: {sort}"})
+        self.sort = sort
+        fields = self.orderings[sort]
+
+        try:
+            size = int(params.get('page_size', self.page_size))
+        except ValueError:
+            raise ValidationError({"page_size": "Invalid page size."})
+        size = max(1, min(size, self.max_page_size))
+
+        self.count = self.get_count(queryset, params.get('count'))
+
+        queryset = queryset.order_by(*[f'-{name}' if desc else name for name, desc in fields])
+        if (cursor := params.get(self.cursor_query_param)):
+            queryset = queryset.filter(self.after(fields, self.decode_cursor(cursor)))
+
+        page = list(queryset[:size + 1])
+        self.next_key = None
+        if len(page) > size:
+            page = page[:size]
+            self.next_key = [getattr(page[-1], name) for name, _ in fields]
+        return page
+
+    def get_paginated_response(self, data):
+        next_url = None
+        if self.next_key is not None:
+            next_url = replace_query_param(
+                self.request.build_absolute_uri(), self.cursor_query_param, self.encode_cursor(self.next_key)
+            )
+        return Response({'count': self.count, 'next': next_url, 'results': data})
+
+    def after(self, fields, values):
+        # (a, b) < (x, y) as a row value, which Postgres can use as a bound on the browse indexes
+        lookup = LessThan if fields[0][1] else GreaterThan
+        return lookup(
+            RowValue(*[F(name) for name, _ in fields]),
+            RowValue(*[Value(value) for value in values])
+        )
+
+    def get_count(self, queryset, mode):
+        if mode == 'exact':
+            return queryset.count()
+        if mode == 'estimate':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                    [queryset.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+            # reltuples is -1 until the table has been analyzed
+            return row[0] if row and row[0] >= 0 else queryset.count()
+        return None
+
+    def encode_cursor(self, values):
+        raw = json.dumps([self.sort, values]).encode()
+        return base64.urlsafe_b64encode(raw).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            sort, values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (binascii.Error, UnicodeError, ValueError, TypeError):
+            raise ValidationError({"cursor": "Invalid cursor."})
+        if sort != self.sort or not isinstance(values, list) or len(values) != len(self.orderings[sort]):
+            raise ValidationError({"cursor": "Cursor does not match this sort order."})
+        for (name, _), value in zip(self.orderings[sort], values):
+            if isinstance(value, bool) or not isinstance(value, self.key_types[name]):
+                raise ValidationError({"cursor": "Invalid cursor."})
+        return values
+
+
+class RowValue(Func):
+    template = '(%(expressions)s)'
+    output_field = Field()
@@ -0,0 +1,57 @@
+import zlib
+
+import numpy as np
+
+from .versions import VersionedCache
+
+
+class RecipeIdPool:
+    """Sorted int64 array of every recipe id, used to draw random samples without a query."""
+
+    def __init__(self, ids):
+        self.ids = np.fromiter(ids, dtype=np.int64)
+        self.ids.sort()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, recipe_id):
+        pos = np.searchsorted(self.ids, recipe_id)
+        if pos == len(self.ids) or self.ids[pos] != recipe_id:
+            self.ids = np.insert(self.ids, pos, recipe_id)
+
+    def remove(self, recipe_id):
+        pos = np.searchsorted(self.ids, recipe_id)
+        if pos < len(self.ids) and self.ids[pos] == recipe_id:
+            self.ids = np.delete(self.ids, pos)
+
+    def sample(self, k, seed):
+        # A fixed seed gives every process the same sample for the same rotation slot
+        rng = np.random.default_rng(seed)
+        picks = rng.choice(len(self.ids), size=min(k, len(self.ids)), replace=False)
+        return self.ids[picks].tolist()
+
+
+def _build_pool():
+    from .models import Recipe
+    return RecipeIdPool(Recipe.objects.values_list('id', flat=True).iterator())
+
+
+# Only recipe creation/deletion bumps this scope (see signals)
+_pool = VersionedCache('recipe_ids', _build_pool)
+
+
+def get_id_pool():
+    return _pool.get()
+
+
+def recipe_added(recipe_id, version):
+    _pool.advance(version, lambda pool: pool.add(recipe_id))
+
+
+def recipe_removed(recipe_id, version):
+    _pool.advance(version, lambda pool: pool.remove(recipe_id))
+
+
+def sample_seed(scope, slot):
+    return [slot, zlib.crc32(scope.encode())]
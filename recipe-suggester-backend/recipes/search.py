@@ -0,0 +1,42 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db.models import F, Q
+
+WORD_RE = re.compile(r'\w+')
+
+
+def prefix_query(text):
+    """Turn free text into a tsquery where every word may be a prefix (for typeahead)."""
+    words = WORD_RE.findall(text.lower())
+    if not words:
+        return None
+    return SearchQuery(' & '.join(f'{word}:*' for word in words), search_type='raw', config='english')
+
+
+def search_recipes(qs, text):
+    """
+    Rank recipes in `qs` against `text` using the weighted search_vector.
+    Falls back to trigram similarity on the title when nothing matches, to catch misspellings.
+    """
+    query = prefix_query(text)
+    if query is None:
+        return qs.none()
+
+    matches = (
+        qs.filter(search_vector=query)
+        .annotate(rank=SearchRank(F('search_vector'), query))
+        .order_by('-rank', 'id')
+    )
+    if matches.exists():
+        return matches
+
+    # Any sufficiently similar word in the title counts; rank by the whole query
+    similar = Q()
+    for word in WORD_RE.findall(text):
+        similar |= Q(title__trigram_word_similar=word)
+    return (
+        qs.filter(similar)
+        .annotate(rank=TrigramWordSimilarity(text, 'title'))
+        .order_by('-rank', 'id')
+    )
@@ -1,5 +1,7 @@
+from django.db.models.manager import BaseManager
 from rest_framework import serializers
-from .models import Ingredient, PantryItem, Recipe, Review, Note
+from .images import variant_urls
+from .models import Ingredient, PantryItem, Recipe, Review, Note, prefetch_favorites, prefetch_ingredients
 
 class IngredientSerializer(serializers.ModelSerializer):
     class Meta:
@@ -18,7 +20,55 @@ class PantryItemSerializer(serializers.ModelSerializer):
         fields = ['id', 'ingredient', 'ingredient_id']
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class PantryBulkSerializer(serializers.Serializer):
+    """`ingredient_ids` replaces the whole pantry (PUT); `add`/`remove` edit it (PATCH)."""
+    ingredient_ids = serializers.ListField(child=serializers.IntegerField(), required=False)
+    add = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    remove = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+
+    def validate(self, attrs):
+        if self.context.get('replace'):
+            if 'ingredient_ids' not in attrs:
+                raise serializers.ValidationError({'ingredient_ids': 'This field is required.'})
+        elif set(attrs['add']) & set(attrs['remove']):
+            raise serializers.ValidationError('An ingredient cannot be both added and removed.')
+
+        wanted = set(attrs.get('ingredient_ids', [])) | set(attrs['add'])
+        unknown = wanted - set(Ingredient.objects.filter(id__in=wanted).values_list('id', flat=True))
+        if unknown:
+            raise serializers.ValidationError({'ingredient_ids': f'Unknown ingredients: {sorted(unknown)}'})
+        return attrs
+
+
+class RecipePageSerializer(serializers.ListSerializer):
+    # Loads the ingredients and favorite flags of every recipe on the page in one query each
+    def to_representation(self, data):
+        recipes = list(data.all() if isinstance(data, BaseManager) else data)
+        prefetch_ingredients(recipes)
+        request = self.context.get('request')
+        prefetch_favorites(recipes, request.user if request else None)
+        return super().to_representation(recipes)
+
+
+class ImageVariantsFieldMixin(serializers.Serializer):
+    # srcset-style map: {"thumb": {"webp": url, "jpeg": url}, "card": ..., "full": ...}
+    image_variants = serializers.SerializerMethodField()
+
+    def get_image_variants(self, obj):
+        return variant_urls(obj.image, obj.image_variants, self.context.get('request'))
+
+
+class FavoritedFieldMixin(serializers.Serializer):
+    is_favorited = serializers.SerializerMethodField()
+
+    def get_is_favorited(self, obj):
+        if not hasattr(obj, '_is_favorited'):
+            request = self.context.get('request')
+            prefetch_favorites([obj], request.user if request else None)
+        return obj._is_favorited
+
+
+class RecipeSerializer(ImageVariantsFieldMixin, FavoritedFieldMixin, serializers.ModelSerializer):
     image = serializers.ImageField(required=False)
     cleaned_ingredients = IngredientSerializer(many=True, read_only=True)
     average_rating = serializers.FloatField(read_only=True)
@@ -27,9 +77,10 @@ class RecipeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recipe
         fields = [
-            'id', 'title', 'instructions', 'image', 'recipeIngred',
-            'cleaned_ingredients', 'average_rating', 'review_count'
+            'id', 'title', 'instructions', 'image', 'image_variants', 'recipeIngred',
+            'cleaned_ingredients', 'average_rating', 'review_count', 'is_favorited'
         ]
+        list_serializer_class = RecipePageSerializer
 
 class RecipeSuggestionSerializer(serializers.Serializer):
     id = serializers.IntegerField()
@@ -39,7 +90,7 @@ class RecipeSuggestionSerializer(serializers.Serializer):
     missing_ingredients = serializers.ListField(child=serializers.CharField())
 
 
-class RecipeListSerializer(serializers.ModelSerializer):
+class RecipeListSerializer(ImageVariantsFieldMixin, FavoritedFieldMixin, serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
     cleaned_ingredients = IngredientSerializer(many=True, read_only=True)
     average_rating = serializers.FloatField(read_only=True)
@@ -48,9 +99,10 @@ class RecipeListSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recipe
         fields = [
-            'id', 'title', 'image', 'cleaned_ingredients',
-            'average_rating', 'review_count'
+            'id', 'title', 'image', 'image_variants', 'cleaned_ingredients',
+            'average_rating', 'review_count', 'is_favorited'
         ]
+        list_serializer_class = RecipePageSerializer
 
     def get_image(self, obj):
         request = self.context.get('request')
@@ -74,7 +126,8 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recipe
         # User input fields
-        fields = ['id', 'title', 'instructions', 'recipeIngred', 'image']  
+        fields = ['id', 'title', 'instructions', 'recipeIngred', 'image', 'indexing_status']
+        read_only_fields = ['indexing_status']
 
 class NoteSerializer(serializers.ModelSerializer):
     user = serializers.ReadOnlyField(source="user.email")
@@ -0,0 +1,166 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .dietary import FLAG_FIELDS, retag_recipes
+from .images import schedule_derivatives
+from .models import Ingredient, PantryItem, Recipe, Review
+from .sampling import recipe_added, recipe_removed
+from .stats import apply_rating_change
+from .trending import record_pantry_change, record_recipe_activity
+from .versions import bump_version
+
+
+@receiver(pre_save, sender=Ingredient)
+def remember_ingredient_flags(sender, instance, **kwargs):
+    if instance.pk:
+        instance._previous_flags = (
+            Ingredient.objects.filter(pk=instance.pk).values_list(*FLAG_FIELDS).first()
+        )
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_flags', None)
+    current = tuple(getattr(instance, field) for field in FLAG_FIELDS)
+    if previous is not None and previous != current:
+        # Only recipes that use this ingredient can change tags; retag once the flag table
+        # can see the new version
+        recipes = Recipe.objects.filter(recipe_ingredients__ingredient=instance)
+        bump_version('ingredients', then=lambda version: retag_recipes(recipes))
+    else:
+        bump_version('ingredients')
+
+
+@receiver(pre_delete, sender=Ingredient)
+def remember_ingredient_recipes(sender, instance, **kwargs):
+    instance._affected_recipe_ids = list(
+        Recipe.objects.filter(recipe_ingredients__ingredient=instance).values_list('id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Ingredient)
+def ingredient_deleted(sender, instance, **kwargs):
+    if getattr(instance, '_affected_recipe_ids', None):
+        recipes = Recipe.objects.filter(id__in=instance._affected_recipe_ids)
+        bump_version('ingredients', then=lambda version: retag_recipes(recipes))
+    else:
+        bump_version('ingredients')
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+def recipe_catalogue_changed(sender, **kwargs):
+    bump_version('recipes')
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_links_saved(sender, instance, **kwargs):
+    if getattr(instance, '_links_changed', False):
+        bump_version('recipe_links')
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_links_deleted(sender, instance, **kwargs):
+    bump_version('recipe_links')
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(sender, instance, created, **kwargs):
+    if created:
+        recipe_id = instance.pk
+        bump_version('recipe_ids', then=lambda version: recipe_added(recipe_id, version))
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_saved(sender, instance, **kwargs):
+    schedule_derivatives(instance, 'image', scope='recipes')
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    # Deleting clears instance.pk before the bump runs
+    recipe_id = instance.pk
+    bump_version('recipe_ids', then=lambda version: recipe_removed(recipe_id, version))
+
+
+@receiver(pre_save, sender=Review)
+def remember_review_rating(sender, instance, **kwargs):
+    if instance.pk:
+        instance._previous_rating = (
+            Review.objects.filter(pk=instance.pk).values_list('rating', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, created, **kwargs):
+    if created:
+        apply_rating_change(instance.recipe_id, instance.rating, 1)
+        record_recipe_activity(instance.recipe_id, reviews=1)
+    elif getattr(instance, '_previous_rating', None) is not None:
+        apply_rating_change(instance.recipe_id, instance.rating - instance._previous_rating, 0)
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    apply_rating_change(instance.recipe_id, -instance.rating, -1)
+
+
+@receiver([post_save, post_delete], sender=Review)
+def reviews_changed(sender, **kwargs):
+    bump_version('reviews')
+
+
+@receiver(pre_save, sender=PantryItem)
+def remember_pantry_ingredient(sender, instance, **kwargs):
+    if instance.pk:
+        instance._previous_item = (
+            PantryItem.objects.filter(pk=instance.pk).values_list('ingredient_id', 'added_at').first()
+        )
+        if instance._previous_item and instance._previous_item[0] != instance.ingredient_id:
+            # Swapping the ingredient counts as a fresh add
+            instance.added_at = timezone.now()
+
+
+@receiver(post_save, sender=PantryItem)
+def pantry_item_saved(sender, instance, created, **kwargs):
+    bump_version(f'pantry:{instance.user_id}')
+    previous = getattr(instance, '_previous_item', None)
+    if created:
+        record_pantry_change([(instance.ingredient_id, instance.added_at)], 1)
+    elif previous is not None and previous[0] != instance.ingredient_id:
+        record_pantry_change([previous], -1)
+        record_pantry_change([(instance.ingredient_id, instance.added_at)], 1)
+
+
+@receiver(post_delete, sender=PantryItem)
+def pantry_item_deleted(sender, instance, **kwargs):
+    bump_version(f'pantry:{instance.user_id}')
+    record_pantry_change([(instance.ingredient_id, instance.added_at)], -1)
+
+
+@receiver(m2m_changed, sender=get_user_model().favorite_recipes.through)
+def favorites_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            bump_version(f'favorites:{instance.pk}')
+        return
+    # Changed from the recipe side: bump every affected user
+    if action == 'pre_clear':
+        pk_set = get_user_model().objects.filter(favorite_recipes=instance).values_list('pk', flat=True)
+    elif not action.startswith('post_') or action == 'post_clear':
+        return
+    for user_id in pk_set:
+        bump_version(f'favorites:{user_id}')
+
+
+@receiver(m2m_changed, sender=get_user_model().favorite_recipes.through)
+def favorites_activity(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove') or not pk_set:
+        return
+    delta = 1 if action == 'post_add' else -1
+    if reverse:
+        record_recipe_activity(instance.pk, favorites=delta * len(pk_set))
+    else:
+        for recipe_id in pk_set:
+            record_recipe_activity(recipe_id, favorites=delta)
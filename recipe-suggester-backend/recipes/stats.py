@@ -0,0 +1,38 @@
+"""
+Review aggregates stored on Recipe. The Review signals keep them current with
+apply_rating_change; the reconcile_recipe_stats command rebuilds them from scratch.
+"""
+from django.db import models
+from django.db.models import Avg, Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Cast, Coalesce, Now, NullIf
+
+from .models import Recipe, Review
+from .versions import bump_version
+
+
+def apply_rating_change(recipe_id, rating_delta, count_delta):
+    """Atomically adjust a recipe's stored review aggregates."""
+    rating_sum = F('rating_sum') + rating_delta
+    review_count = F('review_count') + count_delta
+    Recipe.objects.filter(pk=recipe_id).update(
+        rating_sum=rating_sum,
+        review_count=review_count,
+        average_rating=Cast(rating_sum, models.FloatField()) / Cast(NullIf(review_count, 0), models.FloatField()),
+        updated_at=Now()
+    )
+
+
+def reconcile_recipe_stats():
+    """Rebuild every recipe's stored review aggregates from the Review table in one UPDATE."""
+    reviews = Review.objects.filter(recipe=OuterRef('pk')).values('recipe')
+    rating_sum = reviews.annotate(total=Sum('rating')).values('total')
+    review_count = reviews.annotate(total=Count('id')).values('total')
+    average_rating = reviews.annotate(avg=Avg('rating')).values('avg')
+    updated = Recipe.objects.update(
+        rating_sum=Coalesce(Subquery(rating_sum), 0),
+        review_count=Coalesce(Subquery(review_count), 0),
+        average_rating=Subquery(average_rating)
+    )
+    # A queryset update sends no signals, so cached lists showing the stats are refreshed here
+    bump_version('reviews')
+    return updated
@@ -0,0 +1,99 @@
+import base64
+import binascii
+
+import numpy as np
+
+from .versions import VersionedCache
+
+
+class SuggestionIndex:
+    """
+    Recipe x ingredient incidence matrix stored in CSR form.
+    Row i holds the ingredient columns of recipe_ids[i]; rows are ordered by recipe id.
+    """
+
+    def __init__(self, rows, known_ingredients):
+        self.columns = {}
+        recipe_ids = []
+        indptr = [0]
+        indices = []
+
+        for recipe_id, ingredient_ids in rows:
+            recipe_ids.append(recipe_id)
+            for ingredient_id in dict.fromkeys(ingredient_ids):
+                # Ids of deleted ingredients are ignored until the recipe is relinked
+                if ingredient_id in known_ingredients:
+                    indices.append(self.columns.setdefault(ingredient_id, len(self.columns)))
+            indptr.append(len(indices))
+
+        self.recipe_ids = np.array(recipe_ids, dtype=np.int64)
+        self.indptr = np.array(indptr, dtype=np.int64)
+        self.indices = np.array(indices, dtype=np.int64)
+        self.column_ids = np.array(list(self.columns), dtype=np.int64)
+        self.sizes = np.diff(self.indptr)
+
+    def __len__(self):
+        return len(self.recipe_ids)
+
+    def pantry_vector(self, ingredient_ids):
+        have = np.zeros(len(self.columns), dtype=bool)
+        have[[self.columns[i] for i in ingredient_ids if i in self.columns]] = True
+        return have
+
+    def missing_counts(self, have):
+        # Pantry hits per row from a prefix sum over the flattened incidence matrix
+        hits = np.concatenate(([0], np.cumsum(have[self.indices])))
+        return self.sizes - (hits[self.indptr[1:]] - hits[self.indptr[:-1]])
+
+    def rank(self, missing, max_missing=None, limit=None, after=None):
+        """
+        Row numbers ordered by (missing_count, recipe id), optionally capped.
+        `after` is a (missing_count, recipe_id) pair; only rows ranked after it are kept.
+        """
+        keep = np.ones(len(self), dtype=bool)
+        if max_missing is not None:
+            keep &= missing <= max_missing
+        if after is not None:
+            after_missing, after_id = after
+            keep &= (missing > after_missing) | ((missing == after_missing) & (self.recipe_ids > after_id))
+        rows = np.flatnonzero(keep)
+        # Rows are in id order, so this key is unique and breaks ties by id
+        keys = missing[rows] * len(self) + rows
+        if limit is not None and limit < len(rows):
+            top = np.argpartition(keys, limit - 1)[:limit]
+            rows, keys = rows[top], keys[top]
+        return rows[np.argsort(keys)]
+
+    def missing_ingredients(self, row, have):
+        cols = self.indices[self.indptr[row]:self.indptr[row + 1]]
+        return self.column_ids[cols[~have[cols]]].tolist()
+
+
+def encode_cursor(missing_count, recipe_id):
+    return base64.urlsafe_b64encode(f"{missing_count}:{recipe_id}".encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        missing_count, recipe_id = base64.urlsafe_b64decode(cursor.encode()).decode().split(':')
+        return int(missing_count), int(recipe_id)
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValueError("Invalid cursor.")
+
+
+def _build_index():
+    from .models import Ingredient, Recipe
+    known = set(Ingredient.objects.values_list('id', flat=True))
+    # Unindexed recipes have no ingredient ids yet and would look like they need nothing
+    rows = (
+        Recipe.objects.filter(indexing_status=Recipe.IndexingStatus.READY)
+        .order_by('id').values_list('id', 'ingredient_ids')
+    )
+    return SuggestionIndex(rows.iterator(), known)
+
+
+_index = VersionedCache(('recipe_links', 'ingredients'), _build_index)
+
+
+def get_suggestion_index():
+    return _index.get()
@@ -0,0 +1,15 @@
+from celery import shared_task
+from django.core.management import call_command
+from django.utils.module_loading import import_string
+
+
+@shared_task(ignore_result=True)
+def run_job(path, *args):
+    # Scheduled by recipes.background.run_after_commit
+    import_string(path)(*args)
+
+
+@shared_task(ignore_result=True)
+def run_command(name):
+    # Scheduled by CELERY_BEAT_SCHEDULE
+    call_command(name)
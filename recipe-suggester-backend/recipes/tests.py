@@ -1,16 +1,49 @@
 # recipes/tests.py
+import base64
+from datetime import timedelta
+from io import BytesIO, StringIO
+from itertools import count
+import json
+import os
+import tempfile
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.contrib.auth import get_user_model
-from recipes.models import Recipe, Ingredient, PantryItem
-from unittest.mock import patch, PropertyMock
+from django.core import mail
+from django.core.mail.backends import locmem
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from recipes.models import CatalogueVersion, Recipe, RecipeActivity, Ingredient, NewsletterDelivery, PantryItem, Review
+from recipes.autocomplete import warm_up
+from recipes.dietary import get_flag_table
+from recipes.matching import IngredientMatcher, get_matcher
+from recipes.sampling import get_id_pool
+from recipes.suggestions import get_suggestion_index
+from recipes.trending import refresh_trending_recipes, top_ingredients
+from recipes.versions import bump_version, get_stamps
+from unittest.mock import patch
+from PIL import Image
 
 User = get_user_model()
 
 
+def isolated_cache(test):
+    # An empty cache of the test's own, so responses cached by one test never reach another
+    return override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': test.id()}
+    })
+
+
 class SuggestRecipesViewTests(APITestCase):
     def setUp(self):
+        self.enterContext(isolated_cache(self))
         self.user = User.objects.create_user(
             username="tester", email="t@test.com", password="pass"
         )
@@ -22,8 +55,8 @@ class SuggestRecipesViewTests(APITestCase):
         self.ing_c = Ingredient.objects.create(name="C")
 
         # Create recipes
-        self.r1 = Recipe.objects.create(title="R1", instructions="", recipeIngred="")
-        self.r2 = Recipe.objects.create(title="R2", instructions="", recipeIngred="")
+        self.r1 = Recipe.objects.create(title="R1", instructions="", recipeIngred="A\nB")
+        self.r2 = Recipe.objects.create(title="R2", instructions="", recipeIngred="B\nC")
 
         # Pantry: user only has A
         PantryItem.objects.create(user=self.user, ingredient=self.ing_a)
@@ -31,42 +64,84 @@ class SuggestRecipesViewTests(APITestCase):
     def test_missing_counts(self):
         url = reverse("recipe-suggestions")
 
-        with patch.object(Recipe, "cleaned_ingredients", new_callable=PropertyMock) as mock_cleaned:
-            mock_cleaned.side_effect = [
-                [self.ing_a, self.ing_b],  # R1
-                [self.ing_b, self.ing_c],  # R2
-            ]
-            resp = self.client.get(url)
-            self.assertEqual(resp.status_code, status.HTTP_200_OK)
-            data = resp.json()
-            self.assertEqual(data[0]["title"], "R1")
-            self.assertEqual(data[0]["missing_count"], 1)
-            self.assertEqual(data[1]["title"], "R2")
-            self.assertEqual(data[1]["missing_count"], 2)
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        data = resp.json()
+        self.assertEqual(data[0]["title"], "R1")
+        self.assertEqual(data[0]["missing_count"], 1)
+        self.assertEqual(data[0]["missing_ingredients"], ["B"])
+        self.assertEqual(data[1]["title"], "R2")
+        self.assertEqual(data[1]["missing_count"], 2)
+        self.assertEqual(data[1]["missing_ingredients"], ["B", "C"])
+
+    def test_index_is_rebuilt_only_when_links_change(self):
+        index = get_suggestion_index()
+        self.r1.title = "R1 renamed"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.r1.save()
+        self.assertIs(get_suggestion_index(), index)
+
+        self.r1.recipeIngred = "A\nB\nC"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.r1.save()
+        self.assertIsNot(get_suggestion_index(), index)
 
     def test_can_make_filter(self):
         url = reverse("recipe-suggestions") + "?can_make=true"
 
-        with patch.object(Recipe, "cleaned_ingredients", new_callable=PropertyMock) as mock_cleaned:
-            mock_cleaned.side_effect = [
-                [self.ing_a, self.ing_b],  # R1 → missing B
-                [self.ing_b, self.ing_c],  # R2 → missing B,C
-            ]
-            resp = self.client.get(url)
-            self.assertEqual(resp.json(), [])  # nothing can be made
+        resp = self.client.get(url)
+        self.assertEqual(resp.json(), [])  # nothing can be made
+
+        PantryItem.objects.create(user=self.user, ingredient=self.ing_b)
+        resp = self.client.get(url)
+        self.assertEqual([s["title"] for s in resp.json()], ["R1"])
 
     def test_threshold_filter(self):
         url = reverse("recipe-suggestions") + "?threshold=1"
 
-        with patch.object(Recipe, "cleaned_ingredients", new_callable=PropertyMock) as mock_cleaned:
-            mock_cleaned.side_effect = [
-                [self.ing_a, self.ing_b],  # R1 → 1 missing
-                [self.ing_b, self.ing_c],  # R2 → 2 missing
-            ]
-            resp = self.client.get(url)
-            data = resp.json()
-            self.assertEqual(len(data), 1)
-            self.assertEqual(data[0]["title"], "R1")
+        resp = self.client.get(url)
+        data = resp.json()
+        self.assertEqual(len(data), 1)
+        self.assertEqual(data[0]["title"], "R1")
+
+    def test_limit_and_cursor(self):
+        url = reverse("recipe-suggestions")
+        Recipe.objects.create(title="R3", instructions="", recipeIngred="A")
+
+        page = self.client.get(url + "?limit=2").json()
+        self.assertEqual([s["title"] for s in page["results"]], ["R3", "R1"])
+        self.assertIsNotNone(page["next"])
+
+        page = self.client.get(url, {"limit": 2, "cursor": page["next"]}).json()
+        self.assertEqual([s["title"] for s in page["results"]], ["R2"])
+        self.assertIsNone(page["next"])
+
+    def test_invalid_cursor(self):
+        resp = self.client.get(reverse("recipe-suggestions"), {"limit": 2, "cursor": "nope"})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_database_mode_matches_memory_mode(self):
+        url = reverse("recipe-suggestions")
+        Recipe.objects.create(title="R3", instructions="", recipeIngred="A")
+        for query in ["", "?threshold=1", "?limit=2"]:
+            sep = "&" if query else "?"
+            self.assertEqual(
+                self.client.get(url + query).json(),
+                self.client.get(url + query + sep + "mode=db").json(),
+            )
+
+    def test_grocery_list(self):
+        resp = self.client.get(reverse("grocery-list") + f"?recipes={self.r1.id},{self.r2.id}")
+        self.assertEqual([i["name"] for i in resp.json()], ["B", "C"])
+
+    def test_index_follows_recipe_changes(self):
+        url = reverse("recipe-suggestions")
+        self.client.get(url)
+        self.r2.recipeIngred = "A"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.r2.save()
+        data = self.client.get(url).json()
+        self.assertEqual([(s["title"], s["missing_count"]) for s in data], [("R2", 0), ("R1", 1)])
 
 
 class CreateRecipeViewTests(APITestCase):
@@ -93,3 +168,894 @@ class CreateRecipeViewTests(APITestCase):
         data = resp.json()["data"]
         self.assertEqual(data["title"], "New")
         self.assertIn("id", data)
+
+    def test_indexing_runs_after_commit(self):
+        Ingredient.objects.create(name="Basil")
+        payload = {"title": "Pesto", "recipeIngred": "basil", "instructions": "Blend"}
+        with self.captureOnCommitCallbacks() as callbacks:
+            data = self.client.post(self.url, payload, format="multipart").json()["data"]
+        self.assertEqual(data["indexing_status"], "pending")
+        status_url = reverse("recipe-indexing-status", args=[data["id"]])
+        self.assertEqual(self.client.get(status_url).json()["indexing_status"], "pending")
+        self.assertEqual(Recipe.objects.get(pk=data["id"]).ingredient_ids, [])
+
+        with override_settings(BACKGROUND_TASKS_EAGER=True):
+            for callback in callbacks:
+                callback()
+        self.assertEqual(self.client.get(status_url).json()["indexing_status"], "ready")
+        self.assertEqual(len(Recipe.objects.get(pk=data["id"]).ingredient_ids), 1)
+
+    def test_pending_recipes_are_left_out_of_suggestions_until_indexed(self):
+        basil = Ingredient.objects.create(name="Basil")
+        PantryItem.objects.create(user=self.user, ingredient=basil)
+        payload = {"title": "Pesto", "recipeIngred": "basil", "instructions": "Blend"}
+        # The on-commit job is never run, as if the worker restarted
+        with self.captureOnCommitCallbacks():
+            recipe_id = self.client.post(self.url, payload, format="multipart").json()["data"]["id"]
+        url = reverse("recipe-suggestions")
+        self.assertEqual(self.client.get(url).json(), [])
+        self.assertEqual(self.client.get(url, {"mode": "db"}).json(), [])
+
+        Recipe.objects.filter(pk=recipe_id).update(updated_at=timezone.now() - timedelta(hours=1))
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("index_pending_recipes", stdout=StringIO())
+        self.assertEqual(Recipe.objects.get(pk=recipe_id).indexing_status, "ready")
+        self.assertEqual([r["title"] for r in self.client.get(url).json()], ["Pesto"])
+
+
+class IngredientMatcherTests(TestCase):
+    def setUp(self):
+        self.enterContext(isolated_cache(self))
+        self.matcher = IngredientMatcher([
+            (1, "Onion"), (2, "Garlic"), (3, "Black Pepper"), (4, "Heavy Cream"),
+        ])
+
+    def test_exact_and_fuzzy_lines(self):
+        text = "Onion\n2 cloves garlic, minced\nfreshly ground black peppers\n1 cup heavy cream"
+        self.assertEqual(self.matcher.match(text), [1, 2, 3, 4])
+
+    def test_unknown_line_is_skipped(self):
+        self.assertEqual(self.matcher.match("zzz qqq"), [])
+
+    def test_candidates_are_pruned(self):
+        self.assertNotIn(4, self.matcher.candidates("garlic"))
+
+    def test_rebuilds_when_catalogue_changes(self):
+        Ingredient.objects.create(name="Basil")
+        first = get_matcher()
+        self.assertIs(get_matcher(), first)
+        with self.captureOnCommitCallbacks(execute=True):
+            tomato = Ingredient.objects.create(name="Tomato")
+        self.assertIsNot(get_matcher(), first)
+        recipe = Recipe.objects.create(title="Salad", instructions="", recipeIngred="3 tomatoes\nbasil leaves")
+        self.assertIn(tomato.id, recipe.ingredient_ids)
+
+    def test_rebuilds_after_a_bump_from_another_process(self):
+        first = get_matcher()
+        # Other workers' bumps reach this process only through the shared version table
+        CatalogueVersion.objects.filter(scope="ingredients").update(version=F("version") + 1)
+        self.assertIsNot(get_matcher(), first)
+
+    def test_bump_waits_for_commit(self):
+        version = get_stamps(["ingredients"])["ingredients"][0]
+        with self.captureOnCommitCallbacks() as callbacks:
+            Ingredient.objects.create(name="Salt")
+        self.assertEqual(get_stamps(["ingredients"])["ingredients"][0], version)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(get_stamps(["ingredients"])["ingredients"][0], version + 1)
+
+
+class CleanedIngredientsReadTests(APITestCase):
+    def setUp(self):
+        self.enterContext(isolated_cache(self))
+        self.onion = Ingredient.objects.create(name="Onion")
+        self.garlic = Ingredient.objects.create(name="Garlic")
+        for i in range(5):
+            Recipe.objects.create(title=f"R{i}", instructions="", recipeIngred="onion\ngarlic")
+
+    def test_detail_uses_stored_ids(self):
+        recipe = Recipe.objects.first()
+        with patch("recipes.models.get_matcher") as matcher:
+            resp = self.client.get(reverse("recipe-detail", args=[recipe.id]))
+            matcher.assert_not_called()
+        names = [i["name"] for i in resp.json()["cleaned_ingredients"]]
+        self.assertEqual(names, ["Onion", "Garlic"])
+
+    def test_list_resolves_ingredients_in_one_query(self):
+        get_stamps(["recipes", "reviews", "ingredients"])
+        # version stamps + recipes + ingredients
+        with self.assertNumQueries(3):
+            resp = self.client.get(reverse("recipe-list-minimal"))
+        self.assertEqual(len(resp.json()), 5)
+        self.assertTrue(all(len(r["cleaned_ingredients"]) == 2 for r in resp.json()))
+
+
+class RelinkRecipesCommandTests(TestCase):
+    def setUp(self):
+        self.enterContext(isolated_cache(self))
+        self.recipe = Recipe.objects.create(title="Stew", instructions="", recipeIngred="beef\ncarrot")
+        self.other = Recipe.objects.create(title="Soup", instructions="", recipeIngred="carrot")
+
+    def test_relinks_after_catalogue_change(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            beef = Ingredient.objects.create(name="Beef", is_meat=True)
+            carrot = Ingredient.objects.create(name="Carrot")
+        call_command("relink_recipes", workers=1, stdout=StringIO())
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.ingredient_ids, [beef.id, carrot.id])
+        self.assertIn("contains_meat", self.recipe.dietary_tags)
+        self.assertEqual(set(self.recipe.ingredients.values_list("id", flat=True)), {beef.id, carrot.id})
+
+    def test_ids_filter(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(name="Carrot")
+        call_command("relink_recipes", ids=str(self.other.id), workers=1, stdout=StringIO())
+
+        self.recipe.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual(self.recipe.ingredient_ids, [])
+        self.assertEqual(len(self.other.ingredient_ids), 1)
+
+
+class DietaryTagTests(TestCase):
+    def setUp(self):
+        self.enterContext(isolated_cache(self))
+        self.beef = Ingredient.objects.create(name="Beef", is_meat=True, is_vegan_safe=False, is_keto_friendly=True)
+        self.milk = Ingredient.objects.create(name="Milk", is_dairy=True)
+        self.rice = Ingredient.objects.create(name="Rice", is_keto_friendly=False)
+
+    def test_batch_tags(self):
+        tags = get_flag_table().tag_many([[self.beef.id], [self.milk.id, self.rice.id], [], [999999]])
+        self.assertEqual(tags[0], ["contains_meat", "keto_friendly", "not_vegan", "nut_free"])
+        self.assertEqual(tags[1], ["contains_dairy", "nut_free", "vegetarian"])
+        self.assertEqual(tags[2], tags[3])
+        self.assertIn("vegan", tags[2])
+
+    def test_flag_change_retags_affected_recipes(self):
+        risotto = Recipe.objects.create(title="Risotto", instructions="", recipeIngred="rice")
+        stew = Recipe.objects.create(title="Stew", instructions="", recipeIngred="beef")
+        self.assertIn("vegan", risotto.dietary_tags)
+
+        self.rice.is_nut_free = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rice.save()
+        risotto.refresh_from_db()
+        self.assertIn("contains_nuts", risotto.dietary_tags)
+        self.assertNotIn("nut_free", risotto.dietary_tags)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.beef.delete()
+        stew.refresh_from_db()
+        self.assertIn("vegan", stew.dietary_tags)
+
+    def test_minimal_list_filters_by_several_diets(self):
+        Recipe.objects.create(title="Risotto", instructions="", recipeIngred="rice")
+        Recipe.objects.create(title="Latte", instructions="", recipeIngred="milk")
+        Recipe.objects.create(title="Steak", instructions="", recipeIngred="beef")
+        url = reverse("recipe-list-minimal")
+
+        resp = self.client.get(url, {"diet": "vegetarian,nut_free"})
+        self.assertEqual({r["title"] for r in resp.json()}, {"Risotto", "Latte"})
+        resp = self.client.get(url, {"diet": "vegan"})
+        self.assertEqual([r["title"] for r in resp.json()], ["Risotto"])
+        resp = self.client.get(url, {"diet": "paleo"})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RecipeSearchTests(APITestCase):
+    def setUp(self):
+        self.enterContext(isolated_cache(self))
+        self.pasta = Recipe.objects.create(
+            title="Garlic Mushroom Pasta", instructions="Boil water", recipeIngred="pasta\nmushrooms"
+        )
+        self.soup = Recipe.objects.create(
+            title="Tomato Soup", instructions="Serve with pasta on the side", recipeIngred="tomatoes"
+        )
+        self.url = reverse("recipe-search")
+
+    def test_title_ranks_above_instructions(self):
+        resp = self.client.get(self.url, {"q": "pasta"})
+        self.assertEqual([r["title"] for r in resp.json()], ["Garlic Mushroom Pasta", "Tomato Soup"])
+
+    def test_prefix_match(self):
+        resp = self.client.get(self.url, {"q": "mush"})
+        self.assertEqual([r["id"] for r in resp.json()], [self.pasta.id])
+
+    def test_misspelling_falls_back_to_trigrams(self):
+        resp = self.client.get(self.url, {"q": "tomatoe sopu"})
+        self.assertEqual([r["id"] for r in resp.json()], [self.soup.id])
+
+    def test_minimal_view_uses_search(self):
+        resp = self.client.get(reverse("recipe-list-minimal"), {"search": "tomato"})
+        self.assertEqual([r["id"] for r in resp.json()], [self.soup.id])
+
+
+class IngredientAutocompleteTests(APITestCase):
+    def setUp(self):
+        self.enterContext(isolated_cache(self))
+        for name in ["Black Pepper", "Peppermint", "Pepper", "Pear", "Garlic"]:
+            Ingredient.objects.create(name=name)
+        self.url = reverse("ingredient-autocomplete")
+
+    def names(self, **params):
+        return [i["name"] for i in self.client.get(self.url, params).json()]
+
+    def test_prefix_ranking(self):
+        self.assertEqual(self.names(q="pep"), ["Pepper", "Peppermint", "Black Pepper"])
+
+    def test_limit(self):
+        self.assertEqual(self.names(q="pe", limit=2), ["Pear", "Pepper"])
+
+    def test_fuzzy_fallback(self):
+        self.assertEqual(self.names(q="garlc"), ["Garlic"])
+
+    def test_refreshes_on_write(self):
+        self.assertEqual(self.names(q="bas"), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(name="Basil")
+        self.assertEqual(self.names(q="bas"), ["Basil"])
+
+    @patch("recipes.autocomplete.connections")
+    def test_warm_up_logs_instead_of_raising(self, connections):
+        with patch("recipes.autocomplete.get_matcher", side_effect=OperationalError("database is down")):
+            with self.assertLogs("recipes.autocomplete", "WARNING"):
+                warm_up()
+        connections.close_all.assert_called_once()
+
+
+class RecipeStatsTests(APITestCase):
+    def setUp(self):
+        self.enterContext(isolated_cache(self))
+        self.user = User.objects.create_user(username="rater", email="r@test.com", password="pass")
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(title="Pie", instructions="", recipeIngred="")
+
+    def test_review_writes_update_stats(self):
+        url = reverse("review-list-create", args=[self.recipe.id])
+        self.client.post(url, {"rating": 5, "review_text": "Great"})
+        self.client.post(url, {"rating": 2, "review_text": "Meh"})
+        self.recipe.refresh_from_db()
+        self.assertEqual((self.recipe.rating_sum, self.recipe.review_count), (7, 2))
+        self.assertEqual(self.recipe.average_rating, 3.5)
+
+        Review.objects.filter(rating=5).delete()
+        Review.objects.get().delete()
+        self.recipe.refresh_from_db()
+        self.assertEqual((self.recipe.rating_sum, self.recipe.review_count), (0, 0))
+        self.assertIsNone(self.recipe.average_rating)
+
+    def test_detail_reads_stored_columns(self):
+        Review.objects.create(recipe=self.recipe, user=self.user, rating=4)
+        resp = self.client.get(reverse("recipe-detail", args=[self.recipe.id]))
+        self.assertEqual(resp.json()["average_rating"], 4.0)
+        self.assertEqual(resp.json()["review_count"], 1)
+
+    def test_reconcile_command(self):
+        Review.objects.create(recipe=self.recipe, user=self.user, rating=3)
+        Recipe.objects.update(rating_sum=0, review_count=0, average_rating=None)
+        call_command("reconcile_recipe_stats", stdout=StringIO())
+        self.recipe.refresh_from_db()
+        self.assertEqual((self.recipe.rating_sum, self.recipe.review_count, self.recipe.average_rating), (3, 1, 3.0))
+
+
+class RecipeStreamTests(APITestCase):
+    def setUp(self):
+        self.enterContext(isolated_cache(self))
+        Ingredient.objects.create(name="Flour")
+        for i in range(5):
+            Recipe.objects.create(title=f"Bread {i}", instructions="", recipeIngred="flour")
+
+    def test_streams_ndjson_in_chunks(self):
+        with patch("recipes.views.RecipeListCreate.stream_chunk_size", 2):
+            resp = self.client.get(reverse("recipe-list-create"), {"stream": "true"})
+            self.assertEqual(resp["Content-Type"], "application/x-ndjson")
+            chunks = list(resp.streaming_content)
+        self.assertEqual(len(chunks), 3)
+        lines = b"".join(chunks).decode().splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual([r["title"] for r in rows], [f"Bread {i}" for i in range(5)])
+        self.assertEqual(rows[0]["cleaned_ingredients"][0]["name"], "Flour")
+
+    def test_default_is_json_list(self):
+        resp = self.client.get(reverse("recipe-list-create"))
+        self.assertEqual(len(resp.json()), 5)
+
+
+class BrowseKeysetTests(APITestCase):
+    def setUp(self):
+        self.enterContext(isolated_cache(self))
+        user = User.objects.create_user(username="b", email="b@test.com", password="pass")
+        self.recipes = [Recipe.objects.create(title=f"R{i}", instructions="", recipeIngred="") for i in range(5)]
+        for recipe, rating in zip(self.recipes, [3, 5, None, 5, 1]):
+            if rating:
+                Review.objects.create(recipe=recipe, user=user, rating=rating)
+        self.url = reverse("browse-recipes")
+
+    def walk(self, **params):
+        titles = []
+        resp = self.client.get(self.url, {"pagination": "cursor", "page_size": 2, **params}).json()
+        while True:
+            titles += [r["title"] for r in resp["results"]]
+            if not resp["next"]:
+                return titles, resp
+            resp = self.client.get(resp["next"]).json()
+
+    def test_walks_all_pages_by_id(self):
+        titles, last = self.walk()
+        self.assertEqual(titles, ["R0", "R1", "R2", "R3", "R4"])
+        self.assertIsNone(last["count"])
+
+    def test_sorted_by_rating(self):
+        titles, _ = self.walk(sort="rating")
+        self.assertEqual(titles, ["R3", "R1", "R0", "R4", "R2"])
+
+    def test_optional_count(self):
+        resp = self.client.get(self.url, {"pagination": "cursor", "count": "exact"}).json()
+        self.assertEqual(resp["count"], 5)
+
+    def test_tampered_cursor_is_rejected(self):
+        for values in (["abc"], [True], [None]):
+            cursor = base64.urlsafe_b64encode(json.dumps(["id", values]).encode()).decode()
+            resp = self.client.get(self.url, {"cursor": cursor})
+            self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST, values)
+
+    def test_cursor_is_one_row_value_bound(self):
+        resp = self.client.get(self.url, {"pagination": "cursor", "page_size": 2, "sort": "rating"}).json()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(resp["next"])
+        page_sql = next(q["sql"] for q in queries.captured_queries if "LIMIT 3" in q["sql"])
+        self.assertIn('(COALESCE("recipes_recipe"."average_rating", 0.0), "recipes_recipe"."id") < (', page_sql)
+
+    def test_cursor_must_match_sort(self):
+        resp = self.client.get(self.url, {"pagination": "cursor", "page_size": 2, "sort": "reviews"}).json()
+        cursor = resp["next"].split("cursor=")[1]
+        resp = self.client.get(self.url, {"cursor": cursor, "sort": "id"})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RandomRecipesTests(APITestCase):
+    def setUp(self):
+        self.enterContext(isolated_cache(self))
+        self.recipes = [Recipe.objects.create(title=f"R{i}", instructions="", recipeIngred="") for i in range(30)]
+        self.url = reverse("recipe-list-minimal")
+
+    @override_settings(RANDOM_RECIPES_WINDOW=300)
+    @patch("recipes.views.time")
+    def test_sample_is_stable_within_window(self, clock):
+        # Both requests fall in the window [3000, 3300), whatever the wall clock says
+        clock.time.return_value = 3000.0
+        first = self.client.get(self.url, {"random": "true"}).json()
+        self.assertEqual(len(first), 20)
+        self.assertEqual(len({r["id"] for r in first}), 20)
+        clock.time.return_value = 3299.0
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url, {"random": "true"}).json()
+        self.assertEqual(first, second)
+
+    def test_pool_tracks_creates_and_deletes(self):
+        pool = get_id_pool()
+        with self.captureOnCommitCallbacks(execute=True):
+            new = Recipe.objects.create(title="New", instructions="", recipeIngred="")
+        self.assertIs(get_id_pool(), pool)
+        self.assertIn(new.id, pool.ids)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipes[0].delete()
+        self.assertNotIn(self.recipes[0].id, get_id_pool().ids)
+        self.assertEqual(len(get_id_pool()), 30)
+
+    def test_pool_rebuilds_when_another_process_bumped_first(self):
+        pool = get_id_pool()
+        # A recipe created by another worker: its bump is shared, its in-place add is not
+        elsewhere = Recipe.objects.bulk_create([Recipe(title="Elsewhere", instructions="", recipeIngred="")])[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_version("recipe_ids")
+        with self.captureOnCommitCallbacks(execute=True):
+            here = Recipe.objects.create(title="Here", instructions="", recipeIngred="")
+        self.assertIsNot(get_id_pool(), pool)
+        self.assertLessEqual({elsewhere.id, here.id}, set(get_id_pool().ids.tolist()))
+
+
+class SharedResponseCacheTests(APITestCase):
+    def setUp(self):
+        self.enterContext(isolated_cache(self))
+        self.user = User.objects.create_user(username="c", email="cache@test.com", password="pass")
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(title="Cake", instructions="", recipeIngred="")
+
+    def test_detail_is_served_from_cache_until_a_review(self):
+        url = reverse("recipe-detail", args=[self.recipe.id])
+        self.client.get(url)
+        # Only the version stamps and the updated_at lookup for the conditional GET validators
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(url).json()["review_count"], 0)
+
+        Review.objects.create(recipe=self.recipe, user=self.user, rating=5)
+        self.assertEqual(self.client.get(url).json()["review_count"], 1)
+
+    def test_detail_outlives_writes_to_other_recipes(self):
+        url = reverse("recipe-detail", args=[self.recipe.id])
+        self.client.get(url)
+        other = Recipe.objects.create(title="Pie", instructions="", recipeIngred="")
+        Review.objects.create(recipe=other, user=self.user, rating=3)
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(url).json()["title"], "Cake")
+
+        Recipe.objects.filter(pk=self.recipe.pk).update(review_count=7)
+        self.assertEqual(self.client.get(url).json()["review_count"], 7)
+
+    def test_recipe_edit_invalidates_lists(self):
+        url = reverse("recipe-list-minimal")
+        self.client.get(url, {"trending": "true"})
+        self.recipe.title = "Carrot Cake"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.save()
+        self.assertEqual(self.client.get(url, {"trending": "true"}).json()[0]["title"], "Carrot Cake")
+
+    def test_favorites_are_per_user_and_invalidated(self):
+        url = reverse("recipe-list-minimal")
+        self.assertEqual(self.client.get(url, {"favorite": "true"}).json(), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("toggle-favorite", args=[self.recipe.id]))
+        self.assertEqual(len(self.client.get(url, {"favorite": "true"}).json()), 1)
+
+        other = User.objects.create_user(username="o", email="o@test.com", password="pass")
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(url, {"favorite": "true"}).json(), [])
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        self.enterContext(isolated_cache(self))
+        self.user = User.objects.create_user(username="e", email="etag@test.com", password="pass")
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(title="Soup", instructions="", recipeIngred="")
+
+    def test_detail_not_modified_until_review(self):
+        url = reverse("recipe-detail", args=[self.recipe.id])
+        response = self.client.get(url)
+        etag = response["ETag"]
+        self.assertIn("Last-Modified", response)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Review.objects.create(recipe=self.recipe, user=self.user, rating=4)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_ingredient_list_not_modified_from_version_stamp(self):
+        url = reverse("ingredient-list-create")
+        etag = self.client.get(url)["ETag"]
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(name="salt")
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_minimal_list_if_modified_since(self):
+        url = reverse("recipe-list-minimal")
+        last_modified = self.client.get(url, {"trending": "true"})["Last-Modified"]
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {"trending": "true"}, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class TrendingIngredientsTests(APITestCase):
+    def setUp(self):
+        self.enterContext(isolated_cache(self))
+        self.user = User.objects.create_user(username="p", email="pantry@test.com", password="pass")
+        self.client.force_authenticate(self.user)
+        self.salt = Ingredient.objects.create(name="salt")
+        self.basil = Ingredient.objects.create(name="basil")
+        self.url = reverse("trending-ingredients")
+
+    def add_to_pantries(self, ingredient, count, **fields):
+        items = []
+        for i in range(count):
+            user = User.objects.create_user(username=f"{ingredient.name}{i}", email=f"{ingredient.name}{i}@test.com", password="pass")
+            items.append(PantryItem.objects.create(user=user, ingredient=ingredient, **fields))
+        return items
+
+    def test_counts_follow_pantry_writes(self):
+        self.client.post(reverse("toggle-pantry-item", args=[self.salt.id]))
+        self.client.post(reverse("pantry-list-create"), {"ingredient_id": self.basil.id})
+        self.salt.refresh_from_db()
+        self.assertEqual(self.salt.pantry_count, 1)
+
+        self.client.post(reverse("toggle-pantry-item", args=[self.salt.id]))
+        self.salt.refresh_from_db()
+        self.assertEqual(self.salt.pantry_count, 0)
+        self.assertEqual(Ingredient.objects.get(pk=self.basil.pk).pantry_count, 1)
+
+    def test_leaderboard_is_patched_incrementally(self):
+        self.add_to_pantries(self.salt, 2)
+        self.assertEqual([i["name"] for i in self.client.get(self.url).json()], ["salt", "basil"])
+
+        self.add_to_pantries(self.basil, 3)
+        with self.assertNumQueries(0):
+            self.assertEqual(top_ingredients(2), [self.basil.id, self.salt.id])
+
+    def test_weekly_window_prefers_recent_adds(self):
+        self.add_to_pantries(self.salt, 3, added_at=timezone.now() - timedelta(weeks=4))
+        self.add_to_pantries(self.basil, 1)
+
+        self.assertEqual(self.client.get(self.url).json()[0]["name"], "salt")
+        self.assertEqual(self.client.get(self.url, {"window": "week"}).json()[0]["name"], "basil")
+
+    def test_removal_takes_off_the_weight_of_its_add(self):
+        old, = self.add_to_pantries(self.salt, 1, added_at=timezone.now() - timedelta(weeks=8))
+        self.add_to_pantries(self.basil, 1)
+        PantryItem.objects.create(user=old.user, ingredient=self.basil)
+        old.delete()
+        scores = dict(Ingredient.objects.values_list("name", "trend_score"))
+        self.assertAlmostEqual(scores["salt"], 0.0)
+        self.assertGreater(scores["basil"], 0.0)
+
+    def test_refresh_rebases_old_epochs(self):
+        self.add_to_pantries(self.salt, 2)
+        self.add_to_pantries(self.basil, 1)
+        before = dict(Ingredient.objects.values_list("name", "trend_score"))
+        refresh_trending_recipes(now=timezone.now() + timedelta(weeks=200))
+        after = dict(Ingredient.objects.values_list("name", "trend_score"))
+        self.assertLess(after["salt"], before["salt"])
+        self.assertAlmostEqual(after["salt"] / after["basil"], 2.0)
+
+        PantryItem.objects.filter(ingredient=self.salt).delete()
+        self.assertAlmostEqual(Ingredient.objects.get(pk=self.salt.pk).trend_score, 0.0)
+
+    def test_reconcile_command(self):
+        self.add_to_pantries(self.salt, 2)
+        Ingredient.objects.update(pantry_count=0, trend_score=0.0)
+        call_command("reconcile_pantry_counts", stdout=StringIO())
+        salt = Ingredient.objects.get(pk=self.salt.pk)
+        self.assertEqual(salt.pantry_count, 2)
+        self.assertGreater(salt.trend_score, 0.0)
+
+
+class TrendingRecipesTests(APITestCase):
+    def setUp(self):
+        self.enterContext(isolated_cache(self))
+        self.user = User.objects.create_user(username="t", email="trend@test.com", password="pass")
+        self.client.force_authenticate(self.user)
+        self.old = Recipe.objects.create(title="Old Favourite", instructions="", recipeIngred="")
+        self.new = Recipe.objects.create(title="New Hit", instructions="", recipeIngred="")
+        self.url = reverse("recipe-list-minimal")
+
+    def trending_titles(self, window):
+        response = self.client.get(self.url, {"trending": "true", "window": window})
+        return [recipe["title"] for recipe in response.json()]
+
+    def test_windows_rank_recent_activity(self):
+        for i in range(3):
+            reviewer = User.objects.create_user(username=f"r{i}", email=f"r{i}@test.com", password="pass")
+            Review.objects.create(recipe=self.old, user=reviewer, rating=5)
+        RecipeActivity.objects.filter(recipe=self.old).update(hour=timezone.now() - timedelta(days=3))
+        self.client.post(reverse("toggle-favorite", args=[self.new.id]))
+
+        call_command("refresh_trending_recipes", stdout=StringIO())
+        self.assertEqual(self.trending_titles("24h"), ["New Hit"])
+        self.assertEqual(self.trending_titles("7d"), ["Old Favourite", "New Hit"])
+
+    def test_unfavorite_nets_out(self):
+        favorite = reverse("toggle-favorite", args=[self.new.id])
+        self.client.post(favorite)
+        self.client.post(favorite)
+        self.assertEqual(RecipeActivity.objects.get(recipe=self.new).favorites, 0)
+
+        call_command("refresh_trending_recipes", stdout=StringIO())
+        self.assertEqual(self.trending_titles("24h"), [])
+
+    def test_unknown_window(self):
+        response = self.client.get(self.url, {"trending": "true", "window": "1y"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PantryBulkTests(APITestCase):
+    def setUp(self):
+        self.enterContext(isolated_cache(self))
+        self.user = User.objects.create_user(username="b", email="bulk@test.com", password="pass")
+        self.client.force_authenticate(self.user)
+        self.ingredients = [Ingredient.objects.create(name=f"ingredient {i}") for i in range(4)]
+        self.ids = [i.id for i in self.ingredients]
+        self.url = reverse("pantry-bulk")
+
+    def pantry(self):
+        return set(PantryItem.objects.filter(user=self.user).values_list("ingredient_id", flat=True))
+
+    def test_patch_adds_and_removes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = self.client.patch(self.url, {"add": self.ids[:3]}, format="json").json()
+        self.assertEqual(first["added"], self.ids[:3])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second = self.client.patch(self.url, {"add": [self.ids[3]], "remove": self.ids[:2]}, format="json").json()
+        self.assertEqual(self.pantry(), set(self.ids[2:]))
+        self.assertEqual(second["removed"], self.ids[:2])
+        self.assertNotEqual(first["version"], second["version"])
+        self.assertEqual(Ingredient.objects.get(pk=self.ids[0]).pantry_count, 0)
+        self.assertEqual(Ingredient.objects.get(pk=self.ids[3]).pantry_count, 1)
+
+    def test_put_replaces_pantry(self):
+        PantryItem.objects.create(user=self.user, ingredient=self.ingredients[0])
+        response = self.client.put(self.url, {"ingredient_ids": self.ids[1:3]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.pantry(), set(self.ids[1:3]))
+
+        # No-op edits keep the version
+        again = self.client.put(self.url, {"ingredient_ids": self.ids[1:3]}, format="json").json()
+        self.assertEqual(again["version"], response.json()["version"])
+
+    def test_snapshot_is_taken_under_the_owner_lock(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.patch(self.url, {"add": self.ids[:1]}, format="json")
+        sql = [query["sql"] for query in queries.captured_queries]
+        lock = next(i for i, query in enumerate(sql) if "FOR UPDATE" in query and "users_customuser" in query)
+        snapshot = next(i for i, query in enumerate(sql) if 'FROM "recipes_pantryitem"' in query)
+        self.assertLess(lock, snapshot)
+
+    def test_rejects_unknown_ingredients(self):
+        response = self.client.patch(self.url, {"add": [self.ids[0], 999999]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.pantry(), set())
+
+
+class FavoriteFlagTests(APITestCase):
+    def setUp(self):
+        self.enterContext(isolated_cache(self))
+        self.user = User.objects.create_user(username="f", email="fav@test.com", password="pass")
+        self.other = User.objects.create_user(username="g", email="other@test.com", password="pass")
+        self.client.force_authenticate(self.user)
+        self.liked = Recipe.objects.create(title="Liked", instructions="", recipeIngred="")
+        self.plain = Recipe.objects.create(title="Plain", instructions="", recipeIngred="")
+
+    def flags(self, params=None):
+        response = self.client.get(reverse("recipe-list-minimal"), params or {})
+        return {recipe["title"]: recipe["is_favorited"] for recipe in response.json()}
+
+    def test_toggle_checks_membership(self):
+        url = reverse("toggle-favorite", args=[self.liked.id])
+        self.assertTrue(self.client.post(url).json()["favorited"])
+        self.assertTrue(self.user.has_favorite(self.liked))
+        self.assertFalse(self.client.post(url).json()["favorited"])
+        self.assertFalse(self.user.has_favorite(self.liked.id))
+
+        missing = self.client.post(reverse("toggle-favorite", args=[999999]))
+        self.assertEqual(missing.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_lists_and_detail_flag_favorites_per_user(self):
+        self.assertEqual(self.flags(), {"Liked": False, "Plain": False})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("toggle-favorite", args=[self.liked.id]))
+        self.assertEqual(self.flags(), {"Liked": True, "Plain": False})
+        self.assertTrue(self.client.get(reverse("recipe-detail", args=[self.liked.id])).json()["is_favorited"])
+
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.flags(), {"Liked": False, "Plain": False})
+        self.client.force_authenticate(None)
+        self.assertFalse(self.client.get(reverse("recipe-detail", args=[self.liked.id])).json()["is_favorited"])
+
+    def test_random_sample_is_shared_but_flags_are_not(self):
+        self.user.add_favorite(self.liked)
+        self.assertTrue(self.flags({"random": "true"})["Liked"])
+        self.client.force_authenticate(self.other)
+        self.assertFalse(self.flags({"random": "true"})["Liked"])
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True)
+class ImageVariantTests(APITestCase):
+    def setUp(self):
+        self.enterContext(isolated_cache(self))
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+
+    def upload(self, name="photo.jpg", size=(1000, 600)):
+        buffer = BytesIO()
+        exif = Image.Exif()
+        exif[0x010F] = "Camera Maker"
+        Image.new("RGB", size, (200, 40, 40)).save(buffer, "JPEG", exif=exif)
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/jpeg")
+
+    def test_variants_are_built_after_upload(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = Recipe.objects.create(title="Photo", instructions="", recipeIngred="", image=self.upload())
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_variants["source"], recipe.image.name)
+
+        with default_storage.open(recipe.image_variants["thumb"]["jpeg"]) as f, Image.open(f) as thumb:
+            self.assertEqual(max(thumb.size), 200)
+            self.assertEqual(len(thumb.getexif()), 0)
+
+        data = self.client.get(reverse("recipe-list-minimal")).json()[0]
+        self.assertEqual(set(data["image_variants"]), {"thumb", "card", "full"})
+        self.assertTrue(data["image_variants"]["card"]["webp"].endswith(".card.webp"))
+
+    def test_detail_etag_changes_once_variants_exist(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            recipe = Recipe.objects.create(title="Photo", instructions="", recipeIngred="", image=self.upload())
+        url = reverse("recipe-detail", args=[recipe.id])
+        response = self.client.get(url)
+        self.assertEqual(response.json()["image_variants"], {})
+
+        for callback in callbacks:
+            callback()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("thumb", response.json()["image_variants"])
+
+    def test_small_images_are_not_upscaled(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = Recipe.objects.create(title="Tiny", instructions="", recipeIngred="", image=self.upload(size=(120, 80)))
+        recipe.refresh_from_db()
+        with default_storage.open(recipe.image_variants["full"]["webp"]) as f, Image.open(f) as full:
+            self.assertEqual(full.size, (120, 80))
+
+    def test_backfill_command(self):
+        recipe = Recipe.objects.create(title="Old", instructions="", recipeIngred="", image=self.upload())
+        self.assertEqual(Recipe.objects.get(pk=recipe.pk).image_variants, {})
+        out = StringIO()
+        call_command("generate_image_variants", stdout=out)
+        self.assertIn("1 images", out.getvalue())
+        self.assertIn("thumb", Recipe.objects.get(pk=recipe.pk).image_variants)
+
+
+class NormalizeIngredCommandTests(TestCase):
+    header = "name,is_meat,is_dairy,contains_gluten,is_vegan_safe,is_nut_free,is_keto_friendly\n"
+
+    def setUp(self):
+        self.enterContext(isolated_cache(self))
+        Ingredient.objects.create(name="Butter", is_dairy=False, is_vegan_safe=True)
+        Ingredient.objects.create(name="Rice", is_vegan_safe=True)
+        self.recipe = Recipe.objects.create(title="Toast", instructions="", recipeIngred="butter")
+
+    def run_import(self, rows, *args):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as f:
+            f.write(self.header + rows)
+        self.addCleanup(os.remove, f.name)
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("normalizeIngred", f.name, *args, stdout=out)
+        return out.getvalue()
+
+    def test_batched_upsert(self):
+        rows = "Butter,false,true,false,false,true,true\nRice,false,false,false,true,true,false\nBeef,true,false,false,false,true,true\n,true,,,,,\n"
+        out = self.run_import(rows, "--batch-size", "2", "--retag")
+        self.assertIn("1 created, 1 updated, 1 unchanged, 1 skipped", out)
+        self.assertIn("rows/s", out)
+        self.assertTrue(Ingredient.objects.get(name="Butter").is_dairy)
+        self.assertTrue(Ingredient.objects.get(name="Beef").is_meat)
+
+        self.recipe.refresh_from_db()
+        self.assertIn("contains_dairy", self.recipe.dietary_tags)
+        self.assertIn("contains_dairy", get_flag_table().tags_for(self.recipe.ingredient_ids))
+
+    def test_warns_about_stale_tags_without_retag(self):
+        out = self.run_import("Butter,false,true,false,false,true,true\n")
+        self.assertIn("Flags changed for 1 ingredients", out)
+        self.assertIn("--retag", out)
+        self.assertNotIn("contains_dairy", Recipe.objects.get(pk=self.recipe.pk).dietary_tags)
+
+    def test_dry_run_writes_nothing(self):
+        out = self.run_import("Beef,true,false,false,false,true,true\n", "--dry-run")
+        self.assertIn("Dry run complete: 1 created", out)
+        self.assertFalse(Ingredient.objects.filter(name="Beef").exists())
+
+
+class ImportRecipesCommandTests(TestCase):
+    def setUp(self):
+        self.enterContext(isolated_cache(self))
+        Ingredient.objects.create(name="Beef", is_meat=True)
+        Ingredient.objects.create(name="Carrot")
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "recipes.jsonl")
+        rows = [
+            {"title": "Stew", "instructions": "Simmer", "recipeIngred": "beef\ncarrot"},
+            {"title": "", "recipeIngred": "carrot"},
+            {"title": "Carrot Soup", "instructions": "Blend", "recipeIngred": "carrot"},
+        ]
+        with open(self.path, "w") as f:
+            f.write("\n".join(json.dumps(row) for row in rows) + "\n")
+
+    def import_recipes(self, *args, stderr=None):
+        out = StringIO()
+        call_command(
+            "import_recipes", self.path, "--workers", "1", "--batch-size", "2", *args,
+            stdout=out, stderr=stderr or StringIO()
+        )
+        return out.getvalue()
+
+    def test_imports_linked_and_tagged(self):
+        out = self.import_recipes()
+        self.assertIn("2 recipes imported, 1 rows skipped (0 malformed)", out)
+        stew = Recipe.objects.get(title="Stew")
+        self.assertEqual(len(stew.ingredient_ids), 2)
+        self.assertIn("contains_meat", stew.dietary_tags)
+        self.assertEqual(stew.recipe_ingredients.count(), 2)
+        self.assertIn(stew.id, get_id_pool().ids.tolist())
+
+    def test_resumes_from_checkpoint(self):
+        self.import_recipes()
+        with open(self.path, "a") as f:
+            f.write(json.dumps({"title": "Roast", "recipeIngred": "beef"}) + "\n")
+
+        out = self.import_recipes()
+        self.assertIn("Resuming after 3 rows", out)
+        self.assertEqual(Recipe.objects.count(), 3)
+
+        self.import_recipes("--restart")
+        self.assertEqual(Recipe.objects.filter(title="Stew").count(), 2)
+
+    def test_skips_malformed_rows(self):
+        with open(self.path, "a") as f:
+            f.write('{"title": "Broken",\n')
+            f.write('["not", "an", "object"]\n')
+            f.write(json.dumps({"title": ["Roast"]}) + "\n")
+            f.write(json.dumps({"title": "Roast", "recipeIngred": "beef"}) + "\n")
+        err = StringIO()
+        out = self.import_recipes(stderr=err)
+        self.assertIn("3 recipes imported, 4 rows skipped (3 malformed)", out)
+        self.assertIn("lines 4", err.getvalue())
+        self.assertIn("5, 6", err.getvalue())
+
+        self.assertIn("Resuming after 7 rows", self.import_recipes())
+
+
+class SendNewsletterCommandTests(TestCase):
+    def setUp(self):
+        self.enterContext(isolated_cache(self))
+        Ingredient.objects.create(name="Garlic")
+        self.recipe = Recipe.objects.create(title="Garlic Bread", instructions="Bake", recipeIngred="garlic")
+        self.subscribers = [
+            User.objects.create_user(username=f"s{i}", email=f"s{i}@test.com", password="pass") for i in range(3)
+        ]
+        User.objects.create_user(username="u", email="u@test.com", password="pass", is_subscribed=False)
+
+    def send(self):
+        out = StringIO()
+        call_command("send_newsletter", "--issue", "test", "--batch-size", "2", "--workers", "2", stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def test_sends_personalised_copies_once(self):
+        self.send()
+        self.assertEqual(len(mail.outbox), 3)
+        by_recipient = {message.to[0]: message for message in mail.outbox}
+        user = self.subscribers[1]
+        body = by_recipient[user.email].alternatives[0][0]
+        self.assertIn(f"unsubscribe?user_id={user.id}", body)
+        self.assertIn("Garlic", body)
+        self.assertEqual(by_recipient[user.email].subject, "Weekly Recipe - Garlic Bread")
+
+        late = User.objects.create_user(username="late", email="late@test.com", password="pass")
+        self.send()
+        self.assertEqual([message.to for message in mail.outbox[3:]], [[late.email]])
+
+    def test_failed_batches_are_retried_on_rerun(self):
+        with patch("django.core.mail.backends.locmem.EmailBackend.send_messages", side_effect=OSError("down")):
+            self.assertIn("0 sent, 3 failed", self.send())
+        self.assertEqual(NewsletterDelivery.objects.count(), 0)
+
+        self.assertIn("3 sent, 0 failed", self.send())
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_partial_batch_failure_only_retries_unsent_users(self):
+        send_messages = locmem.EmailBackend.send_messages
+        calls = count(1)
+
+        def drop_second(backend, messages):
+            if next(calls) == 2:
+                raise OSError("connection dropped")
+            return send_messages(backend, messages)
+
+        with patch.object(locmem.EmailBackend, "send_messages", autospec=True, side_effect=drop_second):
+            self.assertIn("2 sent, 1 failed", self.send())
+        self.assertEqual(NewsletterDelivery.objects.count(), 2)
+
+        self.assertIn("1 sent, 0 failed", self.send())
+        self.assertCountEqual([message.to[0] for message in mail.outbox], [user.email for user in self.subscribers])
@@ -0,0 +1,235 @@
+"""
+Popularity counters: ingredients by pantry membership (pantry_count, trend_score),
+recipes by recent reviews and favorites (hourly RecipeActivity folded into TrendingRecipe).
+"""
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Case, Count, F, FloatField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Extract, Greatest, Power
+from django.utils import timezone
+
+from .models import Ingredient, PantryItem, RecipeActivity, TrendEpoch, TrendingRecipe
+from .versions import bump_version
+
+TREND_START = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)  # epoch until the first rebase
+TREND_HALF_LIFE = 7 * 24 * 60 * 60
+# Weights reach 2 ** 52 after a year; a float overflows past 2 ** 1023
+TREND_REBASE_AFTER = timedelta(weeks=52)
+# Pantry changes hold it shared while they convert times to weights; a rebase holds it exclusively
+TREND_LOCK_ID = 0x7472656e64
+LEADERBOARD_SIZE = 50
+LEADERBOARD_TIMEOUT = 5 * 60
+LEADERBOARD_KEY = "ingredient_leaderboard:{}"
+RANKINGS = {'count': 'pantry_count', 'trend': 'trend_score'}
+
+TRENDING_WINDOWS = {'24h': timedelta(hours=24), '7d': timedelta(days=7)}
+TRENDING_SIZE = 100
+REVIEW_WEIGHT = 1
+FAVORITE_WEIGHT = 1
+
+
+def trend_weight(at, epoch):
+    """
+    Forward-decay weight of a pantry add at `at`. Removing the item later takes off the
+    same add-time weight (PantryItem.added_at), so stored scores never need rewriting and
+    the score as of now is trend_score / trend_weight(now, epoch). Weights double every
+    half-life; refresh_trending_recipes rebases the epoch long before they overflow.
+    """
+    return 2.0 ** ((at - epoch).total_seconds() / TREND_HALF_LIFE)
+
+
+def _lock_trend_epoch(exclusive=False):
+    """Current TrendEpoch, locked until the end of the surrounding transaction."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT pg_advisory_xact_lock{'' if exclusive else '_shared'}(%s)", [TREND_LOCK_ID])
+    return _trend_epoch()
+
+
+def _trend_epoch():
+    epoch, _ = TrendEpoch.objects.get_or_create(pk=1, defaults={'started_at': TREND_START})
+    return epoch
+
+
+_deferred = threading.local()
+
+
+@contextmanager
+def deferred_pantry_changes():
+    """Collect record_pantry_change calls (e.g. from per-row delete signals) and apply them together on exit."""
+    if getattr(_deferred, 'changes', None) is not None:
+        yield
+        return
+    _deferred.changes = []
+    try:
+        yield
+        changes = _deferred.changes
+    finally:
+        _deferred.changes = None
+    _apply_pantry_changes(changes)
+
+
+def record_pantry_change(items, delta):
+    """
+    Adjust counters for pantry items added to (delta=1) or removed from (delta=-1) pantries,
+    given as (ingredient_id, added_at) pairs.
+    """
+    changes = [(ingredient_id, added_at, delta) for ingredient_id, added_at in items]
+    if getattr(_deferred, 'changes', None) is not None:
+        _deferred.changes.extend(changes)
+        return
+    _apply_pantry_changes(changes)
+
+
+def _apply_pantry_changes(changes):
+    counts = Counter()
+    weights = defaultdict(float)
+    with transaction.atomic():
+        epoch = _lock_trend_epoch().started_at
+        for ingredient_id, added_at, delta in changes:
+            counts[ingredient_id] += delta
+            weights[ingredient_id] += delta * trend_weight(added_at, epoch)
+        ingredient_ids = [id_ for id_ in counts if counts[id_] or weights[id_]]
+        if not ingredient_ids:
+            return
+        Ingredient.objects.filter(pk__in=ingredient_ids).update(
+            pantry_count=Greatest(F('pantry_count') + _per_ingredient(counts, 0), 0),
+            # Float rounding can leave a fully removed score a hair below zero
+            trend_score=Greatest(F('trend_score') + _per_ingredient(weights, 0.0), 0.0)
+        )
+    rows = list(
+        Ingredient.objects.filter(pk__in=ingredient_ids).values_list('id', *RANKINGS.values())
+    )
+    for i, ranking in enumerate(RANKINGS, start=1):
+        _patch_leaderboard(ranking, [(row[0], row[i]) for row in rows])
+
+
+def _per_ingredient(values, default):
+    return Case(*(When(pk=id_, then=Value(value)) for id_, value in values.items()), default=Value(default))
+
+
+def rebase_trend_scores(now=None):
+    """Move the trend epoch to `now`, rescaling stored scores so later weights start again from 1."""
+    now = timezone.now() if now is None else now
+    with transaction.atomic():
+        epoch = _lock_trend_epoch(exclusive=True)
+        Ingredient.objects.filter(trend_score__gt=0).update(
+            trend_score=F('trend_score') / trend_weight(now, epoch.started_at)
+        )
+        epoch.started_at = now
+        epoch.save(update_fields=['started_at'])
+    cache.delete(LEADERBOARD_KEY.format('trend'))
+
+
+def _patch_leaderboard(ranking, scores):
+    """
+    Apply new scores to the cached top of `ranking`. `floor` bounds the score of every
+    ingredient not on the board, so it can answer a top-N read while its N-th entry is
+    still >= floor; expiring after LEADERBOARD_TIMEOUT bounds drift from concurrent patches.
+    """
+    key = LEADERBOARD_KEY.format(ranking)
+    board = cache.get(key)
+    if board is None:
+        return
+    entries = board['entries']
+    for ingredient_id, score in scores:
+        if ingredient_id in entries:
+            if score >= board['floor']:
+                entries[ingredient_id] = score
+            else:
+                del entries[ingredient_id]
+        elif score > board['floor']:
+            entries[ingredient_id] = score
+            if len(entries) > LEADERBOARD_SIZE:
+                evicted = min(entries, key=entries.get)
+                board['floor'] = max(board['floor'], entries.pop(evicted))
+    cache.set(key, board, LEADERBOARD_TIMEOUT)
+
+
+def _build_leaderboard(ranking):
+    field = RANKINGS[ranking]
+    rows = list(
+        Ingredient.objects.order_by(f'-{field}', 'id').values_list('id', field)[:LEADERBOARD_SIZE + 1]
+    )
+    floor = rows.pop()[1] if len(rows) > LEADERBOARD_SIZE else 0
+    board = {'entries': dict(rows), 'floor': floor}
+    cache.set(LEADERBOARD_KEY.format(ranking), board, LEADERBOARD_TIMEOUT)
+    return board
+
+
+def _ranked(board):
+    return sorted(board['entries'].items(), key=lambda item: (-item[1], item[0]))
+
+
+def top_ingredients(n=10, ranking='count'):
+    """Ids of the n highest-ranked ingredients, rebuilding the leaderboard only when it can't answer."""
+    board = cache.get(LEADERBOARD_KEY.format(ranking))
+    if board is not None:
+        ranked = _ranked(board)
+        if len(ranked) >= n and ranked[n - 1][1] >= board['floor']:
+            return [ingredient_id for ingredient_id, _ in ranked[:n]]
+    return [ingredient_id for ingredient_id, _ in _ranked(_build_leaderboard(ranking))[:n]]
+
+
+def reconcile_pantry_counts():
+    """Rebuild pantry_count and trend_score from the PantryItem table in one UPDATE."""
+    items = PantryItem.objects.filter(ingredient=OuterRef('pk')).values('ingredient')
+    with transaction.atomic():
+        epoch = _lock_trend_epoch(exclusive=True).started_at
+        age = (Extract('added_at', 'epoch') - epoch.timestamp()) / TREND_HALF_LIFE
+        updated = Ingredient.objects.update(
+            pantry_count=Coalesce(Subquery(items.annotate(total=Count('id')).values('total')), 0),
+            trend_score=Coalesce(
+                Subquery(items.annotate(total=Sum(Power(2.0, age))).values('total')), 0.0,
+                output_field=FloatField()
+            )
+        )
+    cache.delete_many([LEADERBOARD_KEY.format(ranking) for ranking in RANKINGS])
+    return updated
+
+
+def record_recipe_activity(recipe_id, reviews=0, favorites=0):
+    """Add events to the recipe's bucket for the current hour."""
+    hour = timezone.now().replace(minute=0, second=0, microsecond=0)
+    bucket = RecipeActivity.objects.filter(recipe_id=recipe_id, hour=hour)
+    changes = {'reviews': F('reviews') + reviews, 'favorites': F('favorites') + favorites}
+    if bucket.update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            RecipeActivity.objects.create(recipe_id=recipe_id, hour=hour, reviews=reviews, favorites=favorites)
+    except IntegrityError:
+        # Another writer created the bucket first
+        bucket.update(**changes)
+
+
+def refresh_trending_recipes(size=TRENDING_SIZE, now=None):
+    """
+    Rewrite TrendingRecipe, the precomputed top-N of each window in TRENDING_WINDOWS, from the
+    activity buckets and prune buckets outside every window.
+    """
+    now = timezone.now() if now is None else now
+    if now - _trend_epoch().started_at >= TREND_REBASE_AFTER:
+        rebase_trend_scores(now)
+    written = {}
+    with transaction.atomic():
+        for window, span in TRENDING_WINDOWS.items():
+            top = (
+                RecipeActivity.objects.filter(hour__gt=now - span)
+                .values('recipe')
+                .annotate(score=Sum('reviews') * REVIEW_WEIGHT + Sum('favorites') * FAVORITE_WEIGHT)
+                .filter(score__gt=0)
+                .order_by('-score', 'recipe')[:size]
+            )
+            TrendingRecipe.objects.filter(window=window).delete()
+            written[window] = len(TrendingRecipe.objects.bulk_create(
+                TrendingRecipe(window=window, rank=rank, recipe_id=row['recipe'], score=row['score'])
+                for rank, row in enumerate(top, start=1)
+            ))
+        RecipeActivity.objects.filter(hour__lte=now - max(TRENDING_WINDOWS.values())).delete()
+    bump_version('trending')
+    return written
@@ -1,17 +1,20 @@
 from django.urls import path
 from .views import (
-    CreateRecipeView, GroceryListView, IngredientListCreate, PantryItemListCreate, PantryItemRetrieveUpdateDelete,
-    RecipeListCreate, RecipeRetrieveUpdateDelete, RecipeListMinimalView,
+    CreateRecipeView, GroceryListView, RecipeIndexingStatusView, IngredientAutocompleteView, IngredientListCreate, PantryBulkView, PantryItemListCreate, PantryItemRetrieveUpdateDelete,
+    RecipeListCreate, RecipeRetrieveUpdateDelete, RecipeListMinimalView, RecipeSearchView,
     ReviewListCreate, RecipeFavoritesList, BrowseRecipesView, TogglePantryItem, TrendingIngredientsView, toggle_favorite, NoteDetailCRUD
 )
 
 urlpatterns = [
     path('ingredients/', IngredientListCreate.as_view(), name='ingredient-list-create'),
+    path('ingredients/autocomplete/', IngredientAutocompleteView.as_view(), name='ingredient-autocomplete'),
     path('pantry/', PantryItemListCreate.as_view(), name='pantry-list-create'),
+    path('pantry/bulk/', PantryBulkView.as_view(), name='pantry-bulk'),
     path('pantry/<int:pk>/', PantryItemRetrieveUpdateDelete.as_view(), name='pantry-item-detail'),
     path('recipes/', RecipeListCreate.as_view(), name='recipe-list-create'),
     path('recipes/<int:pk>/', RecipeRetrieveUpdateDelete.as_view(), name='recipe-detail'),
     path('recipes/minimal/', RecipeListMinimalView.as_view(), name='recipe-list-minimal'),
+    path('recipes/search/', RecipeSearchView.as_view(), name='recipe-search'),
     path("recipes/<int:pk>/reviews/", ReviewListCreate.as_view(), name="review-list-create"),
     path("recipes/favorites/", RecipeFavoritesList.as_view(), name="recipe-favorites"),
     path('recipes/browse/', BrowseRecipesView.as_view(), name='browse-recipes'),
@@ -20,5 +23,6 @@ urlpatterns = [
     path('ingredients/trending/', TrendingIngredientsView.as_view(), name='trending-ingredients'),
     path('grocery-list/',GroceryListView.as_view(),name='grocery-list'),
     path("recipes/create/", CreateRecipeView.as_view(), name="recipe-create"),
+    path("recipes/<int:pk>/status/", RecipeIndexingStatusView.as_view(), name="recipe-indexing-status"),
     path("recipes/<int:pk>/notes/", NoteDetailCRUD.as_view(), name="note_list_create")    
 ]
\ No newline at end of file
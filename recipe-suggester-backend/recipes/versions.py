@@ -0,0 +1,101 @@
+"""
+Version stamps for data that processes cache in memory or in the shared cache.
+
+Each scope has a CatalogueVersion row. bump_version increments it with one UPDATE once the
+writing transaction commits, so concurrent writers in any process get distinct versions and
+never queue on the row for the length of their own transactions.
+"""
+import threading
+import time
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+
+def get_stamps(scopes):
+    """{scope: (version, unix time of the last bump)} for every scope, in one query."""
+    from .models import CatalogueVersion
+    scopes = list(scopes)
+    fields = ('scope', 'version', 'modified')
+    stamps = {
+        scope: (version, modified.timestamp())
+        for scope, version, modified in CatalogueVersion.objects.filter(scope__in=scopes).values_list(*fields)
+    }
+    missing = [scope for scope in scopes if scope not in stamps]
+    if missing:
+        # Seed with a timestamp so a deleted row never reuses an old version, and with no
+        # history treat the scope as changed now rather than claim it is old
+        now = timezone.now()
+        CatalogueVersion.objects.bulk_create(
+            [CatalogueVersion(scope=scope, version=time.time_ns(), modified=now) for scope in missing],
+            ignore_conflicts=True
+        )
+        stamps.update(
+            (scope, (version, modified.timestamp()))
+            for scope, version, modified in CatalogueVersion.objects.filter(scope__in=missing).values_list(*fields)
+        )
+    return stamps
+
+
+def get_version(scope):
+    return get_stamps([scope])[scope][0]
+
+
+def bump_version(scope, then=None):
+    """
+    Bump `scope` when the current transaction commits (now, outside one) and pass the new
+    version to `then`. Rolled-back writes bump nothing.
+    """
+    transaction.on_commit(lambda: _bump(scope, then))
+
+
+def _bump(scope, then):
+    from .models import CatalogueVersion
+    row = CatalogueVersion.objects.filter(scope=scope)
+    with transaction.atomic():
+        # The UPDATE locks the row until commit, so the version read back is this bump's own
+        if not row.update(version=F('version') + 1, modified=timezone.now()):
+            get_stamps([scope])
+            row.update(version=F('version') + 1, modified=timezone.now())
+        version = row.values_list('version', flat=True).get()
+    if then is not None:
+        then(version)
+
+
+class VersionedCache:
+    """
+    Process-wide holder for an object built from the database.
+    The object is rebuilt lazily whenever the version of its scope (or of any
+    scope in a tuple of scopes) is bumped.
+    """
+
+    def __init__(self, scope, build):
+        self.scope = scope
+        self.build = build
+        self._value = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if isinstance(self.scope, str):
+            version = get_version(self.scope)
+        else:
+            stamps = get_stamps(self.scope)
+            version = tuple(stamps[scope][0] for scope in self.scope)
+        if self._value is None or self._version != version:
+            with self._lock:
+                if self._value is None or self._version != version:
+                    self._value = self.build()
+                    self._version = version
+        return self._value
+
+    def advance(self, version, change):
+        """
+        Apply an in-place change for the write that produced `version`, if the
+        cached object was current just before it; otherwise leave it to be rebuilt.
+        """
+        with self._lock:
+            if self._value is not None and self._version == version - 1:
+                change(self._value)
+                self._version = version
@@ -1,45 +1,88 @@
 from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.pagination import PageNumberPagination
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.utils.encoders import JSONEncoder
+from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.core.cache import cache
-from django.db.models import Avg, Count, Q
-import random
-
-from .models import Ingredient, PantryItem, Recipe, Review, Note
+from django.http import StreamingHttpResponse
+from django.db import transaction
+from django.db.models import Count, Q, Value
+from django.db.models.functions import Coalesce
+from itertools import islice
+import json
+import time
+
+from .models import Ingredient, PantryItem, Recipe, RecipeIngredient, Review, Note, favorite_ids
 from .serializers import (
-    IngredientSerializer, PantryItemSerializer, RecipeSerializer,
+    IngredientSerializer, PantryBulkSerializer, PantryItemSerializer, RecipeSerializer,
     RecipeListSerializer, RecipeSuggestionSerializer, ReviewSerializer,
     RecipeCreateSerializer, NoteSerializer
 )
+from .autocomplete import get_autocomplete_index
+from .caching import ConditionalGetMixin, SharedResponseCacheMixin
+from .dietary import parse_diets
+from .indexing import enqueue_indexing
+from .pagination import KeysetPagination
+from .sampling import get_id_pool, sample_seed
+from .search import search_recipes
+from .suggestions import decode_cursor, encode_cursor, get_suggestion_index
+from .trending import TRENDING_WINDOWS, deferred_pantry_changes, record_pantry_change, top_ingredients
+from .versions import bump_version, get_version
 
 # Toggle favorite recipes
 @api_view(["POST"])
 @permission_classes([permissions.IsAuthenticated])
 def toggle_favorite(request, recipe_id):
-    try:
-        recipe = Recipe.objects.get(id=recipe_id)
-    except Recipe.DoesNotExist:
-        return Response({"detail": "Recipe not found."}, status=status.HTTP_404_NOT_FOUND)
-
-    if recipe in request.user.favorite_recipes.all():
-        request.user.favorite_recipes.remove(recipe)
+    user = request.user
+    if user.has_favorite(recipe_id):
+        user.remove_favorite(recipe_id)
         return Response({"favorited": False})
-    else:
-        request.user.favorite_recipes.add(recipe)
-        return Response({"favorited": True})
+
+    if not Recipe.objects.filter(id=recipe_id).exists():
+        return Response({"detail": "Recipe not found."}, status=status.HTTP_404_NOT_FOUND)
+    user.add_favorite(recipe_id)
+    return Response({"favorited": True})
 
 # Ingredient CRUD
-class IngredientListCreate(generics.ListCreateAPIView):
+class IngredientListCreate(ConditionalGetMixin, generics.ListCreateAPIView):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
+    def get_validators(self, request, kwargs):
+        version, modified = self.get_scope_stamps(['ingredients'])['ingredients']
+        return f'"ingredients-{version}"', modified
+
+# Ingredient typeahead
+class IngredientAutocompleteView(APIView):
+    """
+    GET /api/ingredients/autocomplete/?q=
+    Top matches from the in-memory prefix index, with a fuzzy fallback for typos.
+    """
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    max_limit = 50
+
+    def get(self, request):
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 10)), self.max_limit))
+        except ValueError:
+            return Response({"detail": "Invalid limit."}, status=status.HTTP_400_BAD_REQUEST)
+
+        matches = get_autocomplete_index().complete(request.query_params.get('q', ''), limit)
+        return Response([{'id': id_, 'name': name} for id_, name in matches])
+
 # Pantry CRUD
+def lock_pantry(user):
+    """Lock the user row until the transaction ends, so pantry writes that check before they insert run one at a time."""
+    get_user_model().objects.select_for_update().filter(pk=user.pk).exists()
+
 @method_decorator(csrf_exempt, name='dispatch')
 class PantryItemListCreate(generics.ListCreateAPIView):
     serializer_class = PantryItemSerializer
@@ -50,8 +93,10 @@ class PantryItemListCreate(generics.ListCreateAPIView):
 
     def perform_create(self, serializer):
         ingredient = serializer.validated_data.get("ingredient")
-        if not PantryItem.objects.filter(user=self.request.user, ingredient=ingredient).exists():
-            serializer.save(user=self.request.user)
+        with transaction.atomic():
+            lock_pantry(self.request.user)
+            if not PantryItem.objects.filter(user=self.request.user, ingredient=ingredient).exists():
+                serializer.save(user=self.request.user)
 
 class PantryItemRetrieveUpdateDelete(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = PantryItemSerializer
@@ -60,146 +105,353 @@ class PantryItemRetrieveUpdateDelete(generics.RetrieveUpdateDestroyAPIView):
     def get_queryset(self):
         return PantryItem.objects.filter(user=self.request.user)
 
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            lock_pantry(self.request.user)
+            serializer.save()
+
+# Bulk pantry edits
+class PantryBulkView(APIView):
+    """
+    PUT /api/pantry/bulk/ {"ingredient_ids": [...]} replaces the pantry.
+    PATCH /api/pantry/bulk/ {"add": [...], "remove": [...]} edits it.
+    Both apply in one transaction and return the new pantry version.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def put(self, request):
+        return self.apply(request, replace=True)
+
+    def patch(self, request):
+        return self.apply(request, replace=False)
+
+    def apply(self, request, replace):
+        serializer = PantryBulkSerializer(data=request.data, context={'replace': replace})
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        user = request.user
+
+        with transaction.atomic(), deferred_pantry_changes():
+            lock_pantry(user)
+            current = set(PantryItem.objects.filter(user=user).values_list('ingredient_id', flat=True))
+            if replace:
+                added = set(data['ingredient_ids']) - current
+                removed = current - set(data['ingredient_ids'])
+            else:
+                added = set(data['add']) - current
+                removed = set(data['remove']) & current
+
+            # Every pantry writer holds the lock, so `current` is exact and a conflict here is a bug
+            items = PantryItem.objects.bulk_create([PantryItem(user=user, ingredient_id=id_) for id_ in added])
+            if removed:
+                PantryItem.objects.filter(user=user, ingredient_id__in=removed).delete()
+            # bulk_create skips signals; deletes are counted by the post_delete receiver
+            record_pantry_change([(item.ingredient_id, item.added_at) for item in items], 1)
+            if added:
+                bump_version(f'pantry:{user.pk}')
+
+        # Read after commit, when the bumps above have run
+        version = get_version(f'pantry:{user.pk}')
+        return Response({"version": version, "added": sorted(added), "removed": sorted(removed)})
+
 # Toggle pantry ingredient
 class TogglePantryItem(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, ingredient_id):
         user = request.user
-        try:
-            pi = PantryItem.objects.get(user=user, ingredient_id=ingredient_id)
-            pi.delete()
-            return Response({"ingredient_id": ingredient_id, "in_pantry": False})
-        except PantryItem.DoesNotExist:
-            PantryItem.objects.create(user=user, ingredient_id=ingredient_id)
-            return Response({"ingredient_id": ingredient_id, "in_pantry": True}, status=status.HTTP_201_CREATED)
+        with transaction.atomic():
+            lock_pantry(user)
+            try:
+                pi = PantryItem.objects.get(user=user, ingredient_id=ingredient_id)
+                pi.delete()
+                return Response({"ingredient_id": ingredient_id, "in_pantry": False})
+            except PantryItem.DoesNotExist:
+                PantryItem.objects.create(user=user, ingredient_id=ingredient_id)
+                return Response({"ingredient_id": ingredient_id, "in_pantry": True}, status=status.HTTP_201_CREATED)
 
 # Trending ingredients
 class TrendingIngredientsView(generics.ListAPIView):
+    """
+    GET /api/ingredients/trending/ ranks by how many pantries hold each ingredient.
+    With ?window=week it ranks by recent pantry adds instead (one-week half-life).
+    """
     serializer_class = IngredientSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
     def get_queryset(self):
-        return Ingredient.objects.annotate(pantry_count=Count('pantry_items')).order_by('-pantry_count')[:10]
+        ranking = 'trend' if self.request.query_params.get('window') == 'week' else 'count'
+        ids = top_ingredients(10, ranking)
+        by_id = Ingredient.objects.in_bulk(ids)
+        return [by_id[id_] for id_ in ids if id_ in by_id]
 
 # Recipes CRUD
 class RecipeListCreate(generics.ListCreateAPIView):
+    """
+    GET /api/recipes/ returns a JSON list; with ?stream=true (or Accept: application/x-ndjson)
+    the catalogue is streamed as NDJSON, one recipe per line, in fixed-size chunks.
+    """
     serializer_class = RecipeSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    stream_chunk_size = 500
 
     def get_queryset(self):
-        return Recipe.objects.annotate(
-            average_rating=Avg("reviews__rating"),
-            review_count=Count("reviews")
-        )
+        return Recipe.objects.all()
 
-class RecipeRetrieveUpdateDelete(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Recipe.objects.annotate(
-        average_rating=Avg("reviews__rating"),
-        review_count=Count("reviews")
-    )
+    def list(self, request, *args, **kwargs):
+        wants_stream = (
+            request.query_params.get('stream') == 'true'
+            or 'application/x-ndjson' in request.headers.get('Accept', '')
+        )
+        if not wants_stream:
+            return super().list(request, *args, **kwargs)
+        return StreamingHttpResponse(self.stream_ndjson(), content_type='application/x-ndjson')
+
+    def stream_ndjson(self):
+        # Server-side cursor; each chunk is serialized (and its ingredients prefetched) on its own
+        rows = self.filter_queryset(self.get_queryset()).order_by('id').iterator(chunk_size=self.stream_chunk_size)
+        for chunk in iter(lambda: list(islice(rows, self.stream_chunk_size)), []):
+            data = self.get_serializer(chunk, many=True).data
+            yield ''.join(json.dumps(item, cls=JSONEncoder) + '\n' for item in data)
+
+class RecipeRetrieveUpdateDelete(SharedResponseCacheMixin, generics.RetrieveUpdateDestroyAPIView):
+    queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
+    # Entries follow the recipe's own row, so writes to other recipes or reviews leave them cached
+    cache_scopes = ('ingredients',)
+
+    def get_cache_version(self, request, kwargs):
+        # updated_at covers edits and images; the review stats also catch reconcile_recipe_stats
+        row = (
+            Recipe.objects.filter(pk=kwargs['pk'])
+            .values_list('updated_at', 'review_count', 'rating_sum').first()
+        )
+        if row is None:
+            return None, None
+        updated_at, review_count, rating_sum = row
+        stamps = self.get_scope_stamps(self.get_cache_scopes(request))
+        versions = ':'.join(str(version) for version, _ in stamps.values())
+        version = f'{updated_at.timestamp()}:{review_count}:{rating_sum}:{versions}'
+        return version, max(updated_at.timestamp(), *(modified for _, modified in stamps.values()))
+
 # Minimal list for carousels
-class RecipeListMinimalView(generics.ListAPIView):
+class RecipeListMinimalView(SharedResponseCacheMixin, generics.ListAPIView):
     serializer_class = RecipeListSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
-    def get_queryset(self):
-        qs = Recipe.objects.annotate(
-            average_rating=Avg("reviews__rating"),
-            review_count=Count("reviews")
+    def get_cache_scopes(self, request):
+        scopes = super().get_cache_scopes(request)
+        if request.query_params.get('trending') == 'true' and request.query_params.get('window'):
+            return scopes + ('trending',)
+        return scopes
+
+    def get_cache_key(self, request, kwargs):
+        # Random lists rotate on their own window (see random_recipes)
+        if self.wants_plain_random(request):
+            return None
+        return super().get_cache_key(request, kwargs)
+
+    def wants_plain_random(self, request):
+        params = request.query_params
+        return (
+            params.get('random') == 'true'
+            and not params.get('search')
+            and not params.get('diet')
+            and params.get('trending') != 'true'
+            and not (params.get('favorite') == 'true' and request.user.is_authenticated)
         )
+
+    def get_queryset(self):
+        qs = Recipe.objects.all()
         params = self.request.query_params
 
         if (q := params.get('search')):
-            qs = qs.filter(Q(title__icontains=q) | Q(recipeIngred__icontains=q)).distinct()
+            qs = search_recipes(qs, q)
 
         if (diet := params.get('diet')):
-            return qs.filter(dietary_tags__contains=[diet]).distinct()[:20]
+            try:
+                diets = parse_diets(diet)
+            except ValueError as exc:
+                raise ValidationError({"diet": str(exc)})
+            # All requested tags in one GIN-indexed containment check; unindexed recipes have no tags yet
+            return qs.filter(dietary_tags__contains=diets, indexing_status=Recipe.IndexingStatus.READY)[:20]
 
         if params.get('trending') == 'true':
-            cached = cache.get("trending_recipes")
-            if cached is not None:
-                return cached
-            top = qs.annotate(num_reviews=Count('reviews')).order_by('-num_reviews')[:20]
-            cache.set("trending_recipes", top, 300)
-            return top
+            if (window := params.get('window')):
+                # Precomputed by refresh_trending_recipes
+                if window not in TRENDING_WINDOWS:
+                    raise ValidationError({"window": f"Expected one of: {', '.join(TRENDING_WINDOWS)}."})
+                return qs.filter(trending_entries__window=window).order_by('trending_entries__rank')[:20]
+            return qs.order_by('-review_count', 'id')[:20]
 
         if params.get('favorite') == 'true' and self.request.user.is_authenticated:
-            return self.request.user.favorite_recipes.annotate(
-                average_rating=Avg("reviews__rating"),
-                review_count=Count("reviews")
-            ).distinct()[:20]
+            return self.request.user.favorite_recipes.all()[:20]
 
         if params.get('random') == 'true':
-            cached = cache.get("random_recipes")
-            if cached is not None:
-                return cached
-            ids = list(qs.values_list('id', flat=True))
-            sample = random.sample(ids, min(len(ids), 20))
-            rand_qs = qs.filter(id__in=sample)
-            cache.set("random_recipes", rand_qs, 300)
-            return rand_qs
+            # Random picks among search results; plain random lists are served by list()
+            return qs.order_by('?')[:20]
 
         return qs.distinct()[:20]
 
-# Suggestions – optimized
+    def list(self, request, *args, **kwargs):
+        if self.wants_plain_random(request):
+            return Response(self.random_recipes())
+        return super().list(request, *args, **kwargs)
+
+    def random_recipes(self):
+        # One sample per rotation window (global, or per user if configured), cached serialized
+        window = settings.RANDOM_RECIPES_WINDOW
+        user = self.request.user
+        scope = f"user:{user.pk}" if settings.RANDOM_RECIPES_PER_USER and user.is_authenticated else "global"
+        slot = int(time.time() // window)
+        key = f"random_recipes:{scope}:{slot}"
+
+        data = cache.get(key)
+        if data is None:
+            ids = get_id_pool().sample(20, seed=sample_seed(scope, slot))
+            recipes = Recipe.objects.in_bulk(ids)
+            data = self.get_serializer([recipes[id_] for id_ in ids if id_ in recipes], many=True).data
+            cache.set(key, data, window)
+
+        # The sample is shared, the hearts are not
+        favorites = favorite_ids(user, [recipe['id'] for recipe in data])
+        return [{**recipe, 'is_favorited': recipe['id'] in favorites} for recipe in data]
+
+# Full-text recipe search
+class RecipeSearchView(generics.ListAPIView):
+    """
+    GET /api/recipes/search/?q=
+    Ranked full-text search with prefix matching; misspelled queries fall back to trigram similarity.
+    """
+    serializer_class = RecipeListSerializer
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    max_results = 20
+
+    def get_queryset(self):
+        q = self.request.query_params.get('q', '')
+        return search_recipes(Recipe.objects.all(), q)[:self.max_results]
+
+# Suggestions – ranked in memory (default) or by the database (?mode=db)
 class SuggestRecipesView(APIView):
+    """
+    GET /api/recipes/suggestions/
+    Without `limit` the full ranking is returned as a list. With `limit` (and the
+    `cursor` from a previous page) only that page is returned as {results, next}.
+    """
     permission_classes = [permissions.IsAuthenticated]
+    max_limit = 100
 
     def get(self, request):
-        # 1) What the user already has
-        have_ids = set(
-            PantryItem.objects
-            .filter(user=request.user)
-            .values_list('ingredient_id', flat=True)
-        )
+        params = request.query_params
 
-        suggestions = []
-        for recipe in Recipe.objects.all():
-            # 2a) If a test has attached clean_ingredients(), use it
-            if hasattr(recipe, "clean_ingredients") and callable(recipe.clean_ingredients):
-                ingredients = recipe.clean_ingredients()
-            # 2b) Otherwise fall back to the cleaned_ingredients property
-            else:
-                ci = recipe.cleaned_ingredients
-                ingredients = ci() if callable(ci) else (ci or [])
+        limit = after = None
+        if (raw_limit := params.get('limit')) is not None:
+            try:
+                limit = int(raw_limit)
+            except ValueError:
+                return Response({"detail": "Invalid limit."}, status=status.HTTP_400_BAD_REQUEST)
+            limit = max(1, min(limit, self.max_limit))
+        if (c := params.get('cursor')) is not None:
+            try:
+                after = decode_cursor(c)
+            except ValueError:
+                return Response({"detail": "Invalid cursor."}, status=status.HTTP_400_BAD_REQUEST)
 
-            req_ids = {ing.id for ing in ingredients}
-            missing_ids = req_ids - have_ids
+        # 1) Filters
+        limits = []
+        if params.get('can_make') == 'true':
+            limits.append(0)
+        if (t := params.get('threshold')) is not None:
+            try:
+                limits.append(int(t))
+            except ValueError:
+                pass
+        max_missing = min(limits) if limits else None
+
+        # 2) Rank, keeping one extra row to know whether a next page exists
+        rank = self.rank_in_database if params.get('mode') == 'db' else self.rank_in_memory
+        ranked, missing_ids = rank(request.user, max_missing, limit + 1 if limit else None, after)
+        has_next = limit is not None and len(ranked) > limit
+        ranked = ranked[:limit] if limit else ranked
+
+        # 3) Resolve titles and ingredient names for the returned rows only
+        recipes = Recipe.objects.only('id', 'title', 'image').in_bulk([id_ for id_, _ in ranked])
+        names = dict(
+            Ingredient.objects
+            .filter(id__in={id_ for recipe_id, _ in ranked for id_ in missing_ids.get(recipe_id, [])})
+            .values_list('id', 'name')
+        )
 
+        suggestions = []
+        for recipe_id, missing_count in ranked:
+            recipe = recipes.get(recipe_id)
+            if recipe is None:
+                continue
             suggestions.append({
                 'id': recipe.id,
                 'title': recipe.title,
                 'image': recipe.image.url if recipe.image else None,
-                'missing_count': len(missing_ids),
-                'missing_ingredients': [
-                    ing.name for ing in ingredients
-                    if ing.id in missing_ids
-                ]
+                'missing_count': missing_count,
+                'missing_ingredients': [names[id_] for id_ in missing_ids.get(recipe_id, []) if id_ in names],
             })
 
-        # 3) Sort by fewest missing
-        suggestions.sort(key=lambda s: s['missing_count'])
-
-        # 4) Filters
-        if request.query_params.get('can_make') == 'true':
-            suggestions = [s for s in suggestions if s['missing_count'] == 0]
-
-        if (t := request.query_params.get('threshold')) is not None:
-            try:
-                thr = int(t)
-                suggestions = [s for s in suggestions if s['missing_count'] <= thr]
-            except ValueError:
-                pass
-
-        # 5) Return
-        return Response(
-            RecipeSuggestionSerializer(suggestions, many=True).data,
-            status=status.HTTP_200_OK
+        # 4) Return
+        data = RecipeSuggestionSerializer(suggestions, many=True).data
+        if limit is None:
+            return Response(data, status=status.HTTP_200_OK)
+
+        next_cursor = None
+        if has_next:
+            last_id, last_missing = ranked[-1]
+            next_cursor = encode_cursor(last_missing, last_id)
+        return Response({'results': data, 'next': next_cursor}, status=status.HTTP_200_OK)
+
+    def rank_in_memory(self, user, max_missing, limit, after):
+        # Missing counts for every recipe in one vectorized pass over the incidence matrix
+        have_ids = PantryItem.objects.filter(user=user).values_list('ingredient_id', flat=True)
+        index = get_suggestion_index()
+        have = index.pantry_vector(have_ids)
+        missing = index.missing_counts(have)
+
+        rows = index.rank(missing, max_missing=max_missing, limit=limit, after=after)
+        ranked = [(int(index.recipe_ids[row]), int(missing[row])) for row in rows]
+        missing_ids = {
+            int(index.recipe_ids[row]): index.missing_ingredients(row, have)
+            for row in rows
+        }
+        return ranked, missing_ids
+
+    def rank_in_database(self, user, max_missing, limit, after):
+        # One aggregated query over RecipeIngredient, excluding what the pantry already covers
+        pantry = PantryItem.objects.filter(user=user).values('ingredient_id')
+        qs = Recipe.objects.filter(indexing_status=Recipe.IndexingStatus.READY).annotate(
+            missing_count=Count(
+                'recipe_ingredients',
+                filter=~Q(recipe_ingredients__ingredient_id__in=pantry)
+            )
+        )
+        if max_missing is not None:
+            qs = qs.filter(missing_count__lte=max_missing)
+        if after is not None:
+            qs = qs.filter(
+                Q(missing_count__gt=after[0]) | Q(missing_count=after[0], id__gt=after[1])
+            )
+        qs = qs.order_by('missing_count', 'id').values_list('id', 'missing_count')
+        ranked = list(qs[:limit] if limit else qs)
+
+        missing_ids = {}
+        rows = (
+            RecipeIngredient.objects
+            .filter(recipe_id__in=[id_ for id_, _ in ranked])
+            .exclude(ingredient_id__in=pantry)
+            .order_by('id')
+            .values_list('recipe_id', 'ingredient_id')
         )
+        for recipe_id, ingredient_id in rows:
+            missing_ids.setdefault(recipe_id, []).append(ingredient_id)
+        return ranked, missing_ids
 
 
 # Grocery List
@@ -218,18 +470,13 @@ class GroceryListView(APIView):
         except ValueError:
             return Response({"detail": "Invalid recipe IDs format."}, status=status.HTTP_400_BAD_REQUEST)
 
-        have = set(
-            PantryItem.objects
-            .filter(user=request.user)
-            .values_list('ingredient_id', flat=True)
+        missing_qs = (
+            Ingredient.objects
+            .filter(recipe_ingredients__recipe_id__in=ids)
+            .exclude(pantry_items__user=request.user)
+            .distinct()
+            .order_by('name')
         )
-
-        missing_ids = set()
-        for recipe in Recipe.objects.filter(id__in=ids):
-            req_ids = set(recipe.ingredient_ids)
-            missing_ids |= (req_ids - have)
-
-        missing_qs = Ingredient.objects.filter(id__in=missing_ids).order_by('name')
         return Response(IngredientSerializer(missing_qs, many=True).data)
 
 # Recipe Creation
@@ -237,6 +484,8 @@ class CreateRecipeView(APIView):
     """
     POST /api/recipes/create/
     Allows authenticated users to create a new Recipe, including an optional image.
+    Ingredient linking and tagging run in the background; poll
+    /api/recipes/<id>/status/ until indexing_status is "ready".
     """
     permission_classes = [permissions.IsAuthenticated]
     parser_classes     = [MultiPartParser, FormParser]
@@ -246,14 +495,23 @@ class CreateRecipeView(APIView):
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        recipe = serializer.save()
-        # Re-serialize the saved instance so you get all read-only fields, IDs, etc.
-        out = RecipeCreateSerializer(recipe)
+        recipe = serializer.save(indexing_status=Recipe.IndexingStatus.PENDING)
+        enqueue_indexing(recipe.id)
         return Response(
-            {'message': 'Recipe created successfully', 'data': out.data},
+            {'message': 'Recipe created successfully', 'data': serializer.data},
             status=status.HTTP_201_CREATED
         )
 
+# Indexing progress for recipes created through CreateRecipeView
+class RecipeIndexingStatusView(APIView):
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+
+    def get(self, request, pk):
+        indexing_status = Recipe.objects.filter(pk=pk).values_list('indexing_status', flat=True).first()
+        if indexing_status is None:
+            return Response({"detail": "Recipe not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"id": pk, "indexing_status": indexing_status})
+
 # Review list/create
 class ReviewListCreate(generics.ListCreateAPIView):
     serializer_class = ReviewSerializer
@@ -271,21 +529,31 @@ class RecipeFavoritesList(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return self.request.user.favorite_recipes.annotate(
-            average_rating=Avg("reviews__rating"),
-            review_count=Count("reviews")
-        )
+        return self.request.user.favorite_recipes.all()
 
 # Browse all recipes with pagination
-class BrowseRecipesView(generics.ListAPIView):
+class BrowseRecipesView(SharedResponseCacheMixin, generics.ListAPIView):
+    """
+    GET /api/recipes/browse/?page=N uses page numbers.
+    GET /api/recipes/browse/?pagination=cursor[&sort=id|rating|reviews][&cursor=...] uses keyset pagination.
+    """
     serializer_class = RecipeListSerializer
     permission_classes = [permissions.AllowAny]
     pagination_class = PageNumberPagination
 
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            if params.get('pagination') == 'cursor' or 'cursor' in params:
+                self._paginator = KeysetPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
     def get_queryset(self):
         return Recipe.objects.annotate(
-            average_rating=Avg("reviews__rating"),
-            review_count=Count("reviews")
+            rating_key=Coalesce('average_rating', Value(0.0))
         ).order_by('id')
 
 class NoteDetailCRUD(APIView):
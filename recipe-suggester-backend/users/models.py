@@ -4,6 +4,8 @@ from django.db import models
 class CustomUser(AbstractUser):
     email = models.EmailField(unique=True)
     profile_picture = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
+    # Resized copies of `profile_picture`, written by recipes.images.process_image
+    profile_picture_variants = models.JSONField(default=dict, blank=True, editable=False)
     bio = models.TextField(blank=True, null=True)
 
     # is the user subscribed to the newsletter?
@@ -22,12 +24,15 @@ class CustomUser(AbstractUser):
     def __str__(self):
         return self.email
 
+    def has_favorite(self, recipe):
+        """Check membership against the favorites through table without loading the list."""
+        recipe_id = getattr(recipe, 'pk', recipe)
+        return self.favorite_recipes.through.objects.filter(customuser_id=self.pk, recipe_id=recipe_id).exists()
+
     def add_favorite(self, recipe):
         """Add a recipe to the user's favorites."""
         self.favorite_recipes.add(recipe)
-        self.save()
 
     def remove_favorite(self, recipe):
         """Remove a recipe from the user's favorites."""
         self.favorite_recipes.remove(recipe)
-        self.save()
@@ -1,5 +1,6 @@
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
+from recipes.images import variant_urls
 
 User = get_user_model()
 
@@ -10,6 +11,8 @@ class LoginSerializer(serializers.Serializer):
 
 # Serializer for returning user data.
 class UserSerializer(serializers.ModelSerializer):
+    profile_picture_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = User
         fields = (
@@ -19,12 +22,16 @@ class UserSerializer(serializers.ModelSerializer):
             "first_name", 
             "last_name", 
             "profile_picture", 
+            "profile_picture_variants",
             "bio"
         )
         extra_kwargs = {
             'profile_picture': {'required': False, 'allow_null': True},
         }
 
+    def get_profile_picture_variants(self, obj):
+        return variant_urls(obj.profile_picture, obj.profile_picture_variants, self.context.get('request'))
+
 # Serializer for registration.
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True)
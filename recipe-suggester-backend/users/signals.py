@@ -0,0 +1,10 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from recipes.images import schedule_derivatives
+
+
+@receiver(post_save, sender=get_user_model())
+def profile_picture_saved(sender, instance, **kwargs):
+    schedule_derivatives(instance, 'profile_picture')
@@ -8,6 +8,7 @@ from rest_framework import generics
 from rest_framework.authtoken.models import Token
 from rest_framework.decorators import api_view, permission_classes
 from .serializers import LoginSerializer, UserSerializer, RegisterSerializer
+from recipes.images import variant_urls
 from django.http import HttpRequest, HttpResponse
 from django.shortcuts import render
 from rest_framework.parsers import MultiPartParser, FormParser
@@ -51,6 +52,7 @@ def user_profile(request):
         "first_name": user.first_name,
         "last_name": user.last_name,
         "profile_picture": user.profile_picture.url if user.profile_picture else None,
+        "profile_picture_variants": variant_urls(user.profile_picture, user.profile_picture_variants),
         "bio": user.bio,
         "username": user.username,
     }